@@ -142,6 +142,30 @@ REST_FRAMEWORK = {
   
 }
 
+# Response caches, model version counters, poll vote buffers and the autocomplete
+# version stamp all live here. Local memory is per process: point this at Redis or
+# Memcached once more than one worker serves traffic, or invalidations made by one
+# worker will not reach the others. `manage.py flush_poll_votes` runs in its own
+# process and refuses to flush against local memory.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cinecore',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Reviews embedded in movie/webshow/season/episode detail payloads; the rest are
+# reachable through each payload's `reviews_next` link or `?reviews=all`.
+DETAIL_REVIEWS_LIMIT = 5
+
+# Live polls: buffer option vote increments in the cache and write them to
+# PollOption.votes in bulk at most once per interval (seconds). The cache must be
+# shared by all workers; `manage.py flush_poll_votes --interval N` can run the flush
+# as a standalone loop instead of piggybacking on vote requests.
+POLL_VOTES_BUFFERED = False
+POLL_VOTES_FLUSH_INTERVAL = 5
+
 SIMPLE_JWT={
     'ROTATE_REFRESH_TOKENS':True,
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),  # Increase access token lifetime to 60 minutes
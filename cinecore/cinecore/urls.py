@@ -29,6 +29,7 @@ urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
     path('',include('movies.urls')),
     path('api/',include('movies.api.urls')),
+    path('api/',include('webshows.api.urls')),
     path('account/',include('users.api.urls')), 
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from movies.models import ReviewDailyBucket
+
+GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def apply_review(content_type_id, object_id, day, rating, sign):
+    """Add (sign=1) or remove (sign=-1) one review from the bucket of the day it was written."""
+    changes = {'count': F('count') + sign, 'rating_sum': F('rating_sum') + sign * rating}
+    with transaction.atomic():
+        bucket = ReviewDailyBucket.objects.filter(content_type_id=content_type_id,
+                                                  object_id=object_id, date=day)
+        if not bucket.update(**changes) and sign > 0:
+            ReviewDailyBucket.objects.get_or_create(content_type_id=content_type_id,
+                                                    object_id=object_id, date=day)
+            bucket.update(**changes)
+
+
+def series(content_type, object_id, start=None, end=None, granularity='day'):
+    buckets = ReviewDailyBucket.objects.filter(content_type=content_type,
+                                               object_id=object_id, count__gt=0)
+    if start:
+        buckets = buckets.filter(date__gte=start)
+    if end:
+        buckets = buckets.filter(date__lte=end)
+
+    trunc = GRANULARITIES[granularity]
+    if trunc is None:
+        return buckets.order_by('date').values('date', 'count', 'rating_sum')
+    return (buckets.annotate(period=trunc('date')).values('period')
+            .annotate(count=Sum('count'), rating_sum=Sum('rating_sum'))
+            .order_by('period').values('count', 'rating_sum', date=F('period')))
@@ -20,3 +20,8 @@ admin.site.register(Episode)
 admin.site.register(PersonRole)
 admin.site.register(ReviewLike)
 
+admin.site.register(TrendingMovie)
+admin.site.register(RatingAggregate)
+admin.site.register(ReviewDailyBucket)
+admin.site.register(RelatedMovie)
+admin.site.register(ItemSimilarity)
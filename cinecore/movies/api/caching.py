@@ -0,0 +1,186 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from movies import versions
+
+STATS_KEY = 'response-cache:{}:{}'
+
+
+class CachedResponseMixin:
+    """Serve `list` and `retrieve` from the cache until one of `cache_models` changes.
+
+    Entries are keyed on the full path, the versions of `cache_models` and whether the
+    caller is authenticated (or who they are, with `cache_per_user`), and responses carry
+    `Vary: Authorization, Cookie` so shared caches downstream key the same way.
+
+    Detail views that set `cache_detail_models` key `retrieve` on those versions plus
+    `object_timestamps()` instead, so writes to other objects of the same model (a review
+    of another title, say) leave the entry alone.
+    """
+    cache_models = ()
+    cache_detail_models = None
+    cache_timeout = 60 * 60 * 6
+    cache_per_user = False
+    views = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        CachedResponseMixin.views.append(cls.__name__)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, False, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, True, request, *args, **kwargs)
+
+    def object_timestamps(self):
+        """Per-object datetimes for detail requests; None if the object does not exist."""
+        return []
+
+    def response_cache_key(self, request, detail=False):
+        if self.cache_per_user:
+            audience = f'user-{request.user.pk}' if request.user.is_authenticated else 'anon'
+        else:
+            audience = 'auth' if request.user.is_authenticated else 'anon'
+        if detail and self.cache_detail_models is not None:
+            timestamps = cached_object_timestamps(self)
+            if timestamps is None:
+                return None
+            stamps = [*versions.current(self.cache_detail_models),
+                      *(int(stamp.timestamp() * 1e6) if stamp else 0 for stamp in timestamps)]
+        else:
+            stamps = versions.current(self.cache_models)
+        model_versions = ','.join(map(str, stamps))
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'response:{type(self).__name__}:{audience}:{model_versions}:{path}'
+
+    def cached_response(self, handler, detail, request, *args, **kwargs):
+        key = self.response_cache_key(request, detail)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(type(self).__name__, 'hits')
+            response = Response(cached, headers={'X-Cache': 'HIT'})
+        else:
+            _count(type(self).__name__, 'misses')
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout=self.cache_timeout)
+            response['X-Cache'] = 'MISS'
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+
+def _count(view, outcome):
+    key = STATS_KEY.format(view, outcome)
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def stats():
+    """Hit/miss counters per cached view since the cache was last cleared."""
+    keys = {STATS_KEY.format(view, outcome): (view, outcome)
+            for view in CachedResponseMixin.views for outcome in ('hits', 'misses')}
+    counts = {view: {'hits': 0, 'misses': 0} for view in CachedResponseMixin.views}
+    for key, value in cache.get_many(keys).items():
+        view, outcome = keys[key]
+        counts[view][outcome] = value
+    for view_counts in counts.values():
+        total = view_counts['hits'] + view_counts['misses']
+        view_counts['hit_rate'] = round(view_counts['hits'] / total, 3) if total else None
+    return counts
+
+
+class ConditionalGetMixin:
+    """ETag and Last-Modified for `list` and `retrieve`, answered before any serializer runs.
+
+    Validators come from version stamps (cache lookups only): `validator_models`, falling
+    back to `cache_models`. Detail views with a per-object timestamp return it from
+    `object_timestamps` and set `detail_validator_models` (or `cache_detail_models`) to
+    the models they embed but do not own, so edits to other objects leave their ETag alone.
+    """
+    validator_models = None
+    detail_validator_models = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, False, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, True, request, *args, **kwargs)
+
+    def get_validator_models(self, detail):
+        candidates = (self.detail_validator_models if detail else None,
+                      getattr(self, 'cache_detail_models', None) if detail else None,
+                      self.validator_models)
+        for models in candidates:
+            if models is not None:
+                return models
+        return getattr(self, 'cache_models', ())
+
+    def object_timestamps(self):
+        """Per-object datetimes for detail requests; None if the object does not exist."""
+        return []
+
+    def get_validators(self, request, detail):
+        stamps = [versions.as_datetime(stamp)
+                  for stamp in versions.current(self.get_validator_models(detail))]
+        if detail:
+            timestamps = cached_object_timestamps(self)
+            if timestamps is None:
+                return None, None
+            stamps += [stamp for stamp in timestamps if stamp is not None]
+        audience = 'auth' if request.user.is_authenticated else 'anon'
+        source = f'{type(self).__name__}:{request.get_full_path()}:{audience}:{stamps}'
+        etag = f'W/"{hashlib.md5(source.encode()).hexdigest()}"'
+        return etag, max(stamps, default=None)
+
+    def conditional_response(self, handler, detail, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, detail)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            not_modified = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+        else:
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            not_modified = bool(since and last_modified and int(last_modified.timestamp()) <= since)
+
+        if not_modified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+
+def cached_object_timestamps(view):
+    """`view.object_timestamps()`, looked up once per request however many mixins ask."""
+    if not hasattr(view, '_object_timestamps'):
+        view._object_timestamps = view.object_timestamps()
+    return view._object_timestamps
+
+
+def title_timestamps(model, pk, own_field=None):
+    """The title's own timestamp (if it has one) and when its reviews last changed, in one query."""
+    fields = [own_field] if own_field else []
+    try:
+        rows = (model.objects.filter(pk=pk).order_by().values('pk')
+                .annotate(reviewed_at=Max('rating_aggregates__updated_at'))
+                .values_list(*fields, 'reviewed_at')[:1])
+        rows = list(rows)
+    except (TypeError, ValueError):
+        return None
+    return list(rows[0]) if rows else None
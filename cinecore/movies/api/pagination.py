@@ -1,6 +1,171 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor pagination keyed on the queryset's ordering columns.
+
+    Each page is a `WHERE (ordering) < (last row)` range scan, so deep pages cost the
+    same as the first one and rows inserted meanwhile never shift or repeat a page.
+    The ordering must end in a unique column; the primary key is appended otherwise.
+    Expression orderings can't be keyed: annotate them and order by the alias instead.
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    default_ordering = ('pk',)
+    invalid_cursor_message = "Invalid cursor"
+
+    @classmethod
+    def requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get(cls.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self.model_field(queryset, field.lstrip('-')) for field in self.ordering]
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = [self.field_of(field) for field in queryset.query.order_by]
+        ordering = ordering or list(self.default_ordering)
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return tuple(ordering)
+
+    @staticmethod
+    def field_of(ordering):
+        if isinstance(ordering, str):
+            return ordering
+        if isinstance(ordering, OrderBy) and isinstance(ordering.expression, F):
+            name = ordering.expression.name
+            return f'-{name}' if ordering.descending else name
+        raise ImproperlyConfigured(
+            f"Keyset pagination can't order by {ordering!r}; annotate it and order by the alias.")
+
+    @staticmethod
+    def model_field(queryset, name):
+        """The field (or annotation output field) an ordering name resolves to."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        opts = queryset.model._meta
+        *relations, last = name.split('__')
+        for relation in relations:
+            opts = opts.get_field(relation).related_model._meta
+        return opts.pk if last == 'pk' else opts.get_field(last)
+
+    def after(self, position):
+        """Rows strictly after `position` in lexicographic ordering order."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def position_of(self, row):
+        return [self.encode_value(self.value_of(row, field.lstrip('-'))) for field in self.ordering]
+
+    @staticmethod
+    def value_of(row, field):
+        # Orderings may span relations, e.g. `rollup__score`.
+        for name in field.split('__'):
+            row = getattr(row, name)
+        return row
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(position, list) or len(position) != len(self.fields):
+                raise ValueError(position)
+            return [self.decode_value(field, value) for field, value in zip(self.fields, position)]
+        except (TypeError, ValueError, OverflowError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def decode_value(field, value):
+        # Cursors are client input: only scalars the ordering field accepts reach a lookup.
+        if value is None or not isinstance(value, (str, int, float)):
+            raise ValueError(value)
+        value = field.to_python(value)
+        field.run_validators(value)  # Integer range checks, among others.
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        cursor = base64.urlsafe_b64encode(json.dumps(self.next_position).encode()).decode()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
 
 class ReviewPagination(PageNumberPagination):
-    page_size = 10       
-    page_size_query_param = "page_size"  
-    max_page_size = 50
\ No newline at end of file
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Clients opt into keyset pages with ?pagination=cursor and follow `next` from there.
+        self.keyset = KeysetPagination() if KeysetPagination.requested(request) else None
+        if self.keyset:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -5,10 +5,16 @@ from movies.models import (Genre,Platform,Language,PersonRole,
                            PollOption,Poll)
 
 from rest_framework import serializers
+from movies import ratings
+from movies.api.pagination import ReviewPagination
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
 from django.contrib.contenttypes.models import ContentType
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.utils.timezone import localdate
 from django.db.models.functions import TruncDate
 class GenreSerializer(ModelSerializer):
@@ -20,7 +26,7 @@ class ReviewSerializer(ModelSerializer):
     review_user = serializers.StringRelatedField(read_only=True)  # Show username or string representation of user
     content_type = serializers.PrimaryKeyRelatedField(queryset=ContentType.objects.all(), write_only=True)
     object_id = serializers.IntegerField(write_only=True)
-    likes_count = serializers.SerializerMethodField() 
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     movie_title=serializers.SerializerMethodField()
      
 
@@ -37,9 +43,6 @@ class ReviewSerializer(ModelSerializer):
             return obj.content_object.title
         return None
     
-    def get_likes_count(self, obj):
-        return getattr(obj, "like_count", obj.likes.count())
-    
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request, movie_pk=None):
         qs = self.get_queryset().filter(object_id=movie_pk)
@@ -70,6 +73,60 @@ class ReviewDetailSerializer(ModelSerializer):
         read_only_fields=['id','review_user','timestamp']
 
 
+def embedded_review_limit(request):
+    """How many reviews a detail payload embeds; None when ?reviews=all asks for every review."""
+    default=settings.DETAIL_REVIEWS_LIMIT
+    if request is None:
+        return default
+    if request.query_params.get('reviews')=='all':
+        return None
+    try:
+        limit=int(request.query_params.get('reviews_limit',default))
+    except ValueError:
+        limit=default
+    return max(1,min(limit,ReviewPagination.max_page_size))
+
+
+def embedded_reviews_prefetch(limit):
+    queryset=Review.objects.select_related('review_user').order_by('-timestamp','-id')
+    if limit is not None:
+        # Generic relations can't prefetch a sliced queryset, so rank rows per title instead.
+        # One extra row tells us whether a next page exists.
+        queryset=queryset.annotate(embedded_rank=Window(
+            RowNumber(),partition_by=[F('content_type'),F('object_id')],
+            order_by=[F('timestamp').desc(),F('id').desc()],
+        )).filter(embedded_rank__lte=limit+1)
+    return Prefetch('reviews',queryset=queryset)
+
+
+class EmbeddedReviewsMixin:
+    """Top-N reviews plus a link into the paginated reviews endpoint for detail serializers.
+
+    The serialized object must come with `embedded_reviews_prefetch(limit)` applied.
+    """
+    reviews_url_name=None
+
+    def get_reviews(self,obj):
+        reviews=list(obj.reviews.all())
+        for review in reviews:
+            review.content_object=obj
+        limit=embedded_review_limit(self.context.get('request'))
+        if limit is not None:
+            reviews=reviews[:limit]
+        return ReviewSerializer(reviews,many=True).data
+
+    def get_reviews_next(self,obj):
+        limit=embedded_review_limit(self.context.get('request'))
+        if limit is None or len(obj.reviews.all())<=limit:
+            return None
+        url=f"{reverse(self.reviews_url_name,kwargs={'pk':obj.pk})}?page=2&page_size={limit}"
+        request=self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_ratings(self,obj):
+        return ratings.summary_for_object(obj)
+
+
 class PlatformSerializer(ModelSerializer):
     
     class Meta:
@@ -141,14 +198,17 @@ class MovieCreateSerializer(ModelSerializer):
                 'full_synopsis','trailer','runtime','genres','languages',
                 'streaming_platform','subtitles']
 
-class MovieDetailSerializer(ModelSerializer):
+class MovieDetailSerializer(EmbeddedReviewsMixin,ModelSerializer):
     genres=serializers.StringRelatedField(many=True,read_only=True)
     cast = serializers.SerializerMethodField()
     directors = serializers.SerializerMethodField()
     languages=LanguageSerializer(many=True,read_only=True)
     streaming_platform=PlatformSerializer(many=True,read_only=True)
     subtitles=serializers.SerializerMethodField()
-    reviews=ReviewSerializer(many=True,read_only=True)
+    reviews=serializers.SerializerMethodField()
+    reviews_next=serializers.SerializerMethodField()
+    ratings=serializers.SerializerMethodField()
+    reviews_url_name='movie-reviews'
     # writers = serializers.SerializerMethodField()
     # producers = serializers.SerializerMethodField()
   
@@ -157,20 +217,30 @@ class MovieDetailSerializer(ModelSerializer):
         fields=['id','title','poster_image','backdrop_image','release_date','genres',
                 'short_synopsis','full_synopsis','cast', 'directors',
                 'languages','streaming_platform','trailer','runtime',
-                'subtitles','reviews'
+                'subtitles','reviews','reviews_next','ratings'
                 ]
+    @staticmethod
+    def setup_eager_loading(queryset, review_limit=None):
+        # Roles are partitioned in Python below, so a filter() never bypasses this prefetch.
+        return queryset.prefetch_related(
+            'genres', 'languages', 'subtitles', 'streaming_platform',
+            'movie_role__person', 'rating_aggregates',
+            embedded_reviews_prefetch(review_limit),
+        )
+    
     def get_cast(self,obj):
-        role=obj.movie_role.filter(role=MovieRole.ACTOR)
+        role=[r for r in obj.movie_role.all() if r.role==MovieRole.ACTOR]
         return ActorRoleSerializer(role,many=True).data
     
     def get_directors(self,obj):
-        role=obj.movie_role.filter(role=MovieRole.DIRECTOR)
+        role=[r for r in obj.movie_role.all() if r.role==MovieRole.DIRECTOR]
         return CrewRoleSerializer(role,many=True).data  
     
     def get_subtitles(self,obj):
         subtitle=obj.subtitles.all()
         return LanguageSerializer(subtitle,many=True).data
 
+
 class MovieUpdateSerializer(ModelSerializer):
     genres = serializers.PrimaryKeyRelatedField(
         queryset=Genre.objects.all(), many=True
@@ -220,9 +290,13 @@ class FanTheorySerializer(ModelSerializer):
         read_only_fields = ['id', 'upvotes','movie']
 
 class PollOptionSerializer(ModelSerializer):
+    # Writable so PollSerializer.update can match submitted options to existing ones.
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = PollOption
         fields = ['id','option_text','votes']
+        read_only_fields = ['votes']
 
 class PollSerializer(ModelSerializer):
     options = PollOptionSerializer(many=True)
@@ -230,23 +304,43 @@ class PollSerializer(ModelSerializer):
         model = Poll
         fields = ['id','question','options']
     
+    @transaction.atomic
     def create(self, validated_data):
         options_data = validated_data.pop('options')
         poll = Poll.objects.create(**validated_data)
-        for option in options_data:
-            PollOption.objects.create(poll=poll, **option)
+        PollOption.objects.bulk_create(
+            PollOption(poll=poll, option_text=option['option_text']) for option in options_data)
         return poll
     
+    @transaction.atomic
     def update(self,instance, validated_data):
         options_data = validated_data.pop('options', None)
         instance.question = validated_data.get('question', instance.question)
         instance.save()
         
         if options_data is not None:
-           
-            instance.options.all().delete()
+            # Options are matched by id so their votes survive; only options missing
+            # from the payload are deleted, taking their votes with them.
+            existing = {option.pk: option for option in instance.options.all()}
+            kept, changed, added = set(), [], []
             for option in options_data:
-                PollOption.objects.create(poll=instance, **option)
+                option_id = option.get('id')
+                if option_id is None:
+                    added.append(PollOption(poll=instance, option_text=option['option_text']))
+                    continue
+                if option_id not in existing or option_id in kept:
+                    raise serializers.ValidationError({'options': f"Unknown or repeated option id {option_id}."})
+                kept.add(option_id)
+                current = existing[option_id]
+                if current.option_text != option['option_text']:
+                    current.option_text = option['option_text']
+                    changed.append(current)
+
+            removed = existing.keys() - kept
+            if removed:
+                PollOption.objects.filter(pk__in=removed).delete()
+            PollOption.objects.bulk_update(changed, ['option_text'])
+            PollOption.objects.bulk_create(added)
 
         return instance
 
@@ -3,7 +3,9 @@ from movies.api.views import (GenreViewSet,PlatformViewSet,LanguageViewSet,
                               PersonViewSet,PersonRolaViewSet,MovieViewSet,
                               ReviewViewSet,MovieTriviaViewSet,GalleryImageViewSet,
                               BoxOfficeViewSet,AwardViewSet,FanTheoryViewSet,
-                              PollViewSet,related_movies)
+                              PollViewSet,related_movies,search_catalog,
+                              autocomplete_catalog,recommended_titles,
+                              response_cache_stats)
 
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
@@ -60,5 +62,9 @@ urlpatterns = [
 
  
     path("movies/<int:movie_id>/related/", related_movies),
+    path("search/", search_catalog, name='search'),
+    path("autocomplete/", autocomplete_catalog, name='autocomplete'),
+    path("recommendations/", recommended_titles, name='recommendations'),
+    path("cache-stats/", response_cache_stats, name='cache-stats'),
     # path("polls/<int:poll_id>/vote/", vote_poll),
 ]
\ No newline at end of file
@@ -1,14 +1,18 @@
 from rest_framework.views import APIView
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from movies.api.caching import (CachedResponseMixin, ConditionalGetMixin, stats as cache_stats,
+                                title_timestamps)
 from movies.api.pagination import ReviewPagination
+from movies import (activity, autocomplete, bundle, leaderboard, polls, ratings,
+                    recommendations, related, search)
 from django.core.cache import cache
 
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from movies.models import (Genre,Platform,Language,Person,PersonRole,
                            Movie,Review,WebShow,WebSeason,Episode,MovieRole,
                            MovieTrivia,GalleryImage,BoxOffice,Award,FanTheory,
-                           Poll,ReviewLike,FanTheoryVote,PollOption,PollVote)
+                           Poll,ReviewLike,FanTheoryVote,PollOption,PollVote,SearchDocument)
 from movies.api.serializer import (GenreSerializer,PlatformSerializer,
                                    LanguageSerializer,PersonSerializer,
                                    PersonalRoleSerializer,MovieListSerializer,
@@ -17,22 +21,26 @@ from movies.api.serializer import (GenreSerializer,PlatformSerializer,
                                    ReviewDetailSerializer,MovieTriviaSerializer,
                                    GalleryImageSerializer,BoxOfficeSerializer,
                                    AwardSerializer,FanTheorySerializer,
-                                   PollSerializer)
+                                   PollSerializer,embedded_review_limit)
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from django.contrib.contenttypes.models import ContentType
 import django_filters
 from rest_framework import filters
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count,Avg
+from django.db import IntegrityError, transaction
+from django.db.models import Count,Avg,F,Case,When,IntegerField
 from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 
 #permission
 from rest_framework.permissions import IsAuthenticated,IsAdminUser,IsAuthenticatedOrReadOnly
@@ -44,8 +52,9 @@ from movies.api.permission import IsAdminOrReadonly,IsReviewUserOrReadOnly
 #         serializer=GenreSerializer(genre,many=True)
 #         return Response(serializer.data)
 
-class GenreViewSet(viewsets.ReadOnlyModelViewSet):
+class GenreViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset=Genre.objects.all()
+    cache_models=(Genre,)
     serializer_class=GenreSerializer
     
     @action(detail=False, methods=['get'])
@@ -54,16 +63,19 @@ class GenreViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(recent_articles, many=True)
         return Response(serializer.data)
 
-class PlatformViewSet(viewsets.ReadOnlyModelViewSet):
+class PlatformViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset=Platform.objects.all()
+    cache_models=(Platform,)
     serializer_class=PlatformSerializer
 
-class LanguageViewSet(viewsets.ReadOnlyModelViewSet):
+class LanguageViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset=Language.objects.all()
+    cache_models=(Language,)
     serializer_class=LanguageSerializer
     
-class PersonViewSet(viewsets.ReadOnlyModelViewSet):
+class PersonViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset=Person.objects.all()
+    cache_models=(Person, PersonRole, Movie, WebShow)
     serializer_class=PersonSerializer
 
 class PersonRolaViewSet(viewsets.ReadOnlyModelViewSet):
@@ -71,15 +83,57 @@ class PersonRolaViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class=PersonalRoleSerializer
 
 
-class MovieViewSet(viewsets.ModelViewSet):
-    queryset=Movie.objects.prefetch_related(
-        'genres', 'languages', 'subtitles', 'streaming_platform',
-        'movie_role__person', 'reviews'
-    )
+class IndexedSearchFilter(filters.SearchFilter):
+    """`?search=` served from the search index, ranked by relevance.
+
+    Matches whatever the index holds for a title (see search.movie_document), so views
+    need no `search_fields`. Only the best `max_results` hits are returned; searched
+    responses say so in the X-Search-Max-Results header.
+    """
+    search_kind = SearchDocument.MOVIE
+    max_results = 200
+    max_results_header = 'X-Search-Max-Results'
+
+    @classmethod
+    def mark_response(cls, request, response):
+        if search.tokenize(request.query_params.get(cls.search_param, '')):
+            response[cls.max_results_header] = cls.max_results
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '')
+        if not search.tokenize(terms):
+            return queryset
+        hits = search.search(terms, kinds=[self.search_kind], limit=self.max_results)
+        ids = [hit['id'] for hit in hits]
+        rank = Case(*(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+                    output_field=IntegerField())
+        # Annotated rather than ordered by the expression so keyset cursors can key on it.
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+# insights section name -> builder; bundle.SECTIONS says what each one prefetches.
+INSIGHT_SECTIONS = {
+    'movie': lambda movie: MovieListSerializer(movie).data,
+    'trivia': lambda movie: MovieTriviaSerializer(movie.trivia.all(), many=True).data,
+    'gallery': lambda movie: GalleryImageSerializer(movie.gallery.all(), many=True).data,
+    'boxoffice': lambda movie: BoxOfficeSerializer(bundle.boxoffice(movie), many=True).data,
+    'awards': lambda movie: AwardSerializer(movie.awards.all(), many=True).data,
+    'fantheories': lambda movie: FanTheorySerializer(movie.fantheories.all(), many=True).data,
+    'polls': lambda movie: PollSerializer(movie.polls.all(), many=True).data,
+    'related': lambda movie: MovieListSerializer(related.related_movies(movie), many=True).data,
+    'summary': ratings.summary_for_object,
+    'heatmap': bundle.heatmap,
+}
+
+class MovieViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset=Movie.objects.all()
+    # Lists show titles and genres, and ?search= matches platform and people names.
+    # Detail entries are keyed per movie: its updated_at and its reviews' timestamp
+    # (object_timestamps) plus the models it embeds but does not own.
+    cache_models=(Movie, Genre, Platform, Person, PersonRole)
+    cache_detail_models=(Genre, Language, Platform, Person)
     # permission_classes=[IsAdminOrReadonly]
     permission_classes=[IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'streaming_platform__name']
+    filter_backends = [IndexedSearchFilter]
     pagination_class=ReviewPagination 
     
     def get_serializer_class(self):
@@ -96,6 +150,23 @@ class MovieViewSet(viewsets.ModelViewSet):
             return ReviewSerializer
         return MovieDetailSerializer
     
+    def object_timestamps(self):
+        return title_timestamps(Movie, self.kwargs['pk'], 'updated_at')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.action == 'list':
+            IndexedSearchFilter.mark_response(request, response)
+        return response
+
+    def get_queryset(self):
+        if self.action=='list':
+            return self.queryset.prefetch_related('genres')
+        elif self.action=='retrieve':
+            return MovieDetailSerializer.setup_eager_loading(
+                self.queryset, embedded_review_limit(self.request))
+        return self.queryset
+    
     @action(detail=True, methods=['get'])
     def timeline(self, request, pk=None):
         movie = self.get_object()
@@ -129,34 +200,33 @@ class MovieViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def trending(self, request):
-        movies = []
-
-        for movie in Movie.objects.all():
-            critic_data = movie.reviews.filter(is_critic=True).aggregate(avg=Avg("rating"))
-            audience_data = movie.reviews.filter(is_critic=False).aggregate(avg=Avg("rating"))
-
-            critic_avg = critic_data["avg"] or 0
-            audience_avg = audience_data["avg"] or 0
-
-            
-            score = (critic_avg * 0.6) + (audience_avg * 0.4)
-
-           
-            movie.trending_score = round(score, 4)
-            movies.append(movie)
-
-       
-        movies_sorted = sorted(movies, key=lambda m: m.trending_score, reverse=True)[:8]
-
-        serializer = MovieListSerializer(movies_sorted, many=True)
+        serializer = MovieListSerializer(leaderboard.top_movies(), many=True)
         return Response(serializer.data)
 
     
+    @action(detail=True, methods=['get'])
+    def insights(self, request, pk=None):
+        include = request.query_params.get('include')
+        sections = [name.strip() for name in include.split(',') if name.strip()] if include else list(bundle.SECTIONS)
+        unknown = [name for name in sections if name not in bundle.SECTIONS]
+        if unknown:
+            raise ValidationError({"include": f"Unknown sections: {', '.join(unknown)}."})
+
+        # Checked before any section is built, so a matching If-None-Match costs one query.
+        etag = bundle.etag(pk, sections)
+        if etag is None:
+            raise NotFound("Movie not found.")
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        movie = get_object_or_404(bundle.movie_queryset(sections), pk=pk)
+        data = {name: INSIGHT_SECTIONS[name](movie) for name in sections}
+        return Response(data, headers={'ETag': etag})
+
     @action(detail=True,methods=['GET','POST'])
     def reviews(self,request, *args, **kwargs):
         movie=self.get_object()
         if request.method=='GET':
-            queryset=movie.reviews.all().order_by("-timestamp")
+            queryset=movie.reviews.select_related("review_user").order_by("-timestamp","-id")
             
             paginator = ReviewPagination()  
             page = paginator.paginate_queryset(queryset, request)
@@ -230,8 +300,9 @@ class MovieCastView(viewsets.ModelViewSet):
         serializer=PersonalRoleSerializer(queryset,many=True)
         return Response(serializer.data)
 
-class MovieTriviaViewSet(viewsets.ModelViewSet):
+class MovieTriviaViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = MovieTrivia.objects.all()
+    validator_models = (MovieTrivia,)
     serializer_class = MovieTriviaSerializer
     # permission_classes = [IsAuthenticatedOrReadOnly]
     def get_queryset(self):
@@ -240,8 +311,9 @@ class MovieTriviaViewSet(viewsets.ModelViewSet):
         qs=qs.filter(movie_id=movie_id)
         return qs
 
-class GalleryImageViewSet(viewsets.ModelViewSet):
+class GalleryImageViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = GalleryImage.objects.all()
+    validator_models = (GalleryImage,)
     serializer_class = GalleryImageSerializer
     # permission_classes = [IsAuthenticatedOrReadOnly]
     def get_queryset(self):
@@ -250,8 +322,9 @@ class GalleryImageViewSet(viewsets.ModelViewSet):
         qs=qs.filter(movie_id=movie_id)
         return qs
 
-class BoxOfficeViewSet(viewsets.ModelViewSet):
+class BoxOfficeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = BoxOffice.objects.all()
+    validator_models = (BoxOffice,)
     serializer_class = BoxOfficeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     def get_queryset(self):
@@ -260,8 +333,9 @@ class BoxOfficeViewSet(viewsets.ModelViewSet):
         qs=qs.filter(movie_id=movie_id)
         return qs
 
-class AwardViewSet(viewsets.ModelViewSet):
+class AwardViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Award.objects.all()
+    validator_models = (Award,)
     serializer_class = AwardSerializer
     # permission_classes = [IsAuthenticatedOrReadOnly]
     def get_queryset(self):
@@ -302,26 +376,77 @@ class FanTheoryViewSet(viewsets.ModelViewSet):
     def upvote(self, request, pk=None,**kwargs):
         theory = self.get_object()
         user = request.user
-
-        vote, created = FanTheoryVote.objects.get_or_create(theory=theory, user=user)
-
-        if vote.points >= 5:
+        max_points = FanTheoryVote.MAX_POINTS
+
+        with transaction.atomic():
+            # The points__lt guard makes the cap part of the UPDATE itself, so parallel
+            # clicks can never push a vote past max_points.
+            votes = FanTheoryVote.objects.filter(theory=theory, user=user, points__lt=max_points)
+            upvoted = votes.update(points=F('points') + 1)
+            if not upvoted:
+                try:
+                    with transaction.atomic():
+                        FanTheoryVote.objects.create(theory=theory, user=user, points=1)
+                    upvoted = True
+                except IntegrityError:
+                    # Either the vote is capped or a concurrent first click created it.
+                    upvoted = votes.update(points=F('points') + 1)
+            if upvoted:
+                FanTheory.objects.filter(pk=theory.pk).update(upvotes=F('upvotes') + 1)
+
+        theory.refresh_from_db(fields=['upvotes'])
+        if not upvoted:
             return Response({"status": "max_points_reached", "upvotes": theory.upvotes}, status=400)
+        return Response({"status": "upvoted", "upvotes": theory.upvotes})
 
-        vote.points += 1  
-        vote.save()
+@api_view(["GET"])
+def search_catalog(request):
+    kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+    unknown = set(kinds) - {kind for kind, _ in SearchDocument.KINDS}
+    if unknown:
+        return Response({"error": f"Unknown type: {', '.join(sorted(unknown))}"}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    results = search.search(request.query_params.get('q', ''), kinds=kinds, limit=limit)
+    return Response({"results": results})
 
-        total_points = sum(v.points for v in theory.votes.all())
-        theory.upvotes = total_points
-        theory.save()
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([])
+def autocomplete_catalog(request):
+    # No authentication or serializers: this runs on every keystroke.
+    kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 25)
+    except ValueError:
+        limit = 10
+    return Response({"results": autocomplete.complete(request.query_params.get('q', ''), kinds, limit)})
 
-        return Response({"status": "upvoted", "upvotes": theory.upvotes})
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def recommended_titles(request):
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    source, results = recommendations.for_user(request.user, limit)
+    return Response({"source": source, "results": results})
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    return Response(cache_stats())
 
 @api_view(["GET"])
 def related_movies(request, movie_id):
-    movie = get_object_or_404(Movie, pk=movie_id)
-    related = Movie.objects.filter(genres__in=movie.genres.all()).exclude(id=movie.id).distinct()
-    serializer = MovieListSerializer(related, many=True)
+    try:
+        limit = min(max(int(request.query_params.get('limit', related.DEFAULT_LIMIT)), 1),
+                    related.NEIGHBOURS)
+    except ValueError:
+        limit = related.DEFAULT_LIMIT
+    serializer = MovieListSerializer(related.related_movies(movie_id, limit), many=True)
     return Response(serializer.data)
 
 class PollViewSet(viewsets.ModelViewSet):
@@ -339,27 +464,70 @@ class PollViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"])
     def vote(self, request,pk=None, movie_pk=None):
-        # poll = self.get_object()
-        poll = self.get_object() 
-        print(poll)
         option_id = request.data.get('option_id')
-        print(option_id)
-        user = request.user
         if not option_id:
             return Response({"error": "option_id required"}, status=400)
-        
-        if PollVote.objects.filter(user=user, poll=poll).exists():
-            return Response({"error": "You have already voted."}, status=400)
-        
-        try:
-            option = poll.options.get(id=option_id)
-        except PollOption.DoesNotExist:
+
+        option = PollOption.objects.filter(pk=option_id, poll__in=self.get_queryset().filter(pk=pk)).first()
+        if option is None:
+            get_object_or_404(self.get_queryset(), pk=pk)
             return Response({"error": "Option not found"}, status=404)
-        PollVote.objects.create(user=user, poll=poll, option=option)
-        option.votes += 1
-        option.save()
 
-        return Response({"option_id": option.id, "votes": option.votes})
+        try:
+            votes = polls.cast_vote(option, request.user)
+        except polls.AlreadyVoted:
+            return Response({"error": "You have already voted."}, status=400)
+        return Response({"option_id": option.id, "votes": votes})
+
+    @action(detail=True, methods=["get"])
+    def results(self, request, pk=None, movie_pk=None):
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({"error": "since must be a version from a previous response"}, status=400)
+
+        data = polls.results(int(pk), since=since) if pk.isdigit() else None
+        movie_id = data.pop('movie') if data else None
+        if data is None or (movie_pk is not None and str(movie_id) != movie_pk):
+            raise NotFound()
+
+        data['your_vote'] = None
+        if request.user.is_authenticated:
+            data['your_vote'] = (PollVote.objects.filter(poll_id=pk, user=request.user)
+                                 .values_list('option_id', flat=True).first())
+        return Response(data)
+
+    def perform_create(self, serializer):
+        serializer.save(movie=get_object_or_404(Movie, pk=self.kwargs.get('movie_pk')))
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        polls.invalidate(serializer.instance.pk)
+
+    def perform_destroy(self, instance):
+        polls.invalidate(instance.pk)
+        super().perform_destroy(instance)
+
+def require_title(model, pk):
+    """Raise Http404 unless `model` has a row with this pk (ratings alone can't tell)."""
+    try:
+        exists = model.objects.filter(pk=pk).exists()
+    except (TypeError, ValueError):
+        exists = False
+    if not exists:
+        raise Http404
+
+
+class RatingSummaryView(APIView):
+    model = None
+
+    def get(self, request, pk):
+        require_title(self.model, pk)
+        content_type = ContentType.objects.get_for_model(self.model)
+        return Response(ratings.get_summary(content_type, pk))
+
 #Review views
 class ReviewView(viewsets.ModelViewSet):
     queryset=Review.objects.all()
@@ -386,8 +554,20 @@ class ReviewFilter(django_filters.FilterSet):
     
          
 
+def _date_param(request,name):
+    value=request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed=parse_date(value)
+    except ValueError:
+        parsed=None
+    if parsed is None:
+        raise ValidationError({name: "Must be a date in YYYY-MM-DD format."})
+    return parsed
+
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.select_related('review_user').all()
+    queryset = Review.objects.select_related('review_user').order_by('-timestamp', '-id')
     # serializer_class=ReviewSerializer
     filter_backends=[DjangoFilterBackend]
     filterset_class=ReviewFilter
@@ -430,18 +610,23 @@ class ReviewViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
-    @action(detail=True, methods=["post"])
-    def like(self, request, pk=None):
+    @action(detail=True, methods=["post", "put", "delete"], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None, movie_pk=None):
+        # Idempotent: POST/PUT like and DELETE unlike, so repeated clicks can't flip the state.
         review = self.get_object()
         user = request.user
 
-        existing_like = ReviewLike.objects.filter(like_user=user, review=review).first()
-        if existing_like:
-            existing_like.delete()
-            return Response({"detail": "Unliked"}, status=status.HTTP_200_OK)
-
-        ReviewLike.objects.create(like_user=user, review=review)
-        return Response({"detail": "Liked successfully"}, status=status.HTTP_201_CREATED)
+        with transaction.atomic():
+            if request.method == "DELETE":
+                ReviewLike.objects.filter(like_user=user, review=review).delete()
+                liked, created = False, False
+            else:
+                _, created = ReviewLike.objects.get_or_create(like_user=user, review=review)
+                liked = True
+
+        review.refresh_from_db(fields=["like_count"])
+        data = {"detail": "Liked successfully" if liked else "Unliked", "likes_count": review.like_count}
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'], url_path='popular')
     def popular(self,request,  movie_pk=None):
@@ -452,8 +637,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
             return Response({"error": "movie_id is required"}, status=400)
         reviews = (
             Review.objects.filter(content_type=movie_ct, object_id=movie_pk)
-            .annotate(like_count=Count('likes'))
-            .order_by('-like_count', '-timestamp')
+            .select_related('review_user')
+            .order_by('-like_count', '-timestamp', '-id')
         )
         page = self.paginate_queryset(reviews)
         if page is not None:
@@ -465,36 +650,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='summary')
     def ratings_summary(self, request, movie_pk=None):
-        reviews = Review.objects.filter(object_id=movie_pk)
-
-        critic_stats = reviews.filter(is_critic=True).aggregate(
-            avg=Avg('rating'), count=Count('id')
-        )
-        audience_stats = reviews.filter(is_critic=False).aggregate(
-            avg=Avg('rating'), count=Count('id')
-        )
-
-        data = {
-            "critic": {
-                "avg": round(critic_stats["avg"], 1) if critic_stats["avg"] else 0,
-                "count": critic_stats["count"]
-            },
-            "audience": {
-                "avg": round(audience_stats["avg"], 1) if audience_stats["avg"] else 0,
-                "count": audience_stats["count"]
-            }
-        }
-        return Response(data)
+        require_title(Movie, movie_pk)
+        movie_ct = ContentType.objects.get_for_model(Movie)
+        return Response(ratings.get_summary(movie_ct, movie_pk))
     
     @action(detail=False, methods=['get'], url_path='heatmap')
     def heatmap(self,request,movie_pk=None):
-        print(movie_pk)
+        granularity=request.query_params.get('granularity','day')
+        if granularity not in activity.GRANULARITIES:
+            raise ValidationError({"granularity": f"Must be one of {', '.join(activity.GRANULARITIES)}."})
+        start=_date_param(request,'from')
+        end=_date_param(request,'to')
         movie_ct=ContentType.objects.get_for_model(Movie)
-        reviews=Review.objects.filter(content_type=movie_ct,object_id=movie_pk)
-        heatmap_data=reviews.annotate(date=TruncDate('timestamp')
-                                      ).values('date').annotate(count=Count('id')
-                                      ).order_by('date')
-        return Response(heatmap_data)
+        return Response(activity.series(movie_ct,movie_pk,start,end,granularity))
         
     
     
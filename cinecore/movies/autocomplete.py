@@ -0,0 +1,79 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from movies.models import Movie, Person, SearchDocument, WebShow
+from movies.search import tokenize
+
+# Every process keeps a sorted array of (normalized key, ...) entries and answers
+# prefix lookups with bisect. Catalog writes bump VERSION_KEY in the shared cache;
+# a process rebuilds its array on the first lookup that sees a newer version.
+VERSION_KEY = 'autocomplete:version'
+SOURCES = (
+    (SearchDocument.MOVIE, Movie, 'title'),
+    (SearchDocument.WEBSHOW, WebShow, 'title'),
+    (SearchDocument.PERSON, Person, 'name'),
+)
+CANDIDATES = 50
+
+_index = (None, [])
+_lock = threading.Lock()
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def invalidate():
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def current_version():
+    cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def build():
+    """Entries for every word start of every title and name, so "knight" finds
+    "The Dark Knight"; `offset` is the word position, used to rank full-title hits first."""
+    entries = []
+    for kind, model, field in SOURCES:
+        for pk, label in model.objects.values_list('pk', field).iterator():
+            words = normalize(label).split()
+            for offset in range(len(words)):
+                entries.append((' '.join(words[offset:]), offset, kind, pk, label))
+    entries.sort()
+    return entries
+
+
+def entries():
+    global _index
+    version = current_version()
+    if _index[0] != version:
+        with _lock:
+            if _index[0] != version:
+                _index = (version, build())
+    return _index[1]
+
+
+def complete(query, kinds=None, limit=10):
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    index = entries()
+    matches = {}
+    position = bisect_left(index, (prefix,))
+    while position < len(index) and len(matches) < CANDIDATES:
+        key, offset, kind, pk, label = index[position]
+        if not key.startswith(prefix):
+            break
+        position += 1
+        if kinds and kind not in kinds:
+            continue
+        if (kind, pk) not in matches or offset < matches[kind, pk][0]:
+            matches[kind, pk] = (offset, len(label), label)
+
+    ranked = sorted(matches.items(), key=lambda item: item[1][:2])[:limit]
+    return [{'type': kind, 'id': pk, 'label': label} for (kind, pk), (_, _, label) in ranked]
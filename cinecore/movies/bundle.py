@@ -0,0 +1,75 @@
+import hashlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Max, OuterRef, Prefetch, Subquery, Sum
+
+from movies import activity, versions
+from movies.models import (Award, BoxOffice, FanTheory, GalleryImage, Genre, Movie, MovieTrivia,
+                           PersonRole, Poll, PollOption)
+
+# section name -> (prefetch lookups, models it embeds besides the movie and its reviews).
+# The movie's updated_at and its rating aggregate's updated_at cover the movie row, the
+# rating summary and the heatmap buckets, which review signals move together.
+SECTIONS = {
+    'movie': (['genres'], (Genre,)),
+    'trivia': (['trivia'], (MovieTrivia,)),
+    'gallery': (['gallery'], (GalleryImage,)),
+    'boxoffice': ([], (BoxOffice,)),
+    'awards': (['awards'], (Award,)),
+    'fantheories': (['fantheories'], (FanTheory,)),
+    'polls': ([Prefetch('polls', queryset=Poll.objects.prefetch_related('options'))],
+              (Poll, PollOption)),
+    'related': ([], (Movie, Genre, PersonRole)),
+    'summary': (['rating_aggregates'], ()),
+    'heatmap': ([], ()),
+}
+
+
+def _total(queryset, movie, field):
+    rows = queryset.filter(**{movie: OuterRef('pk')}).order_by().values(movie)
+    return Subquery(rows.annotate(total=Sum(field)).values('total'))
+
+
+# Vote counters move with queryset.update(), which bumps no version stamp, so their
+# per-movie totals go into the ETag instead.
+COUNTERS = {
+    'fantheories': lambda: _total(FanTheory.objects, 'movie', 'upvotes'),
+    'polls': lambda: _total(PollOption.objects, 'poll__movie', 'votes'),
+}
+
+
+def movie_queryset(sections):
+    lookups = [lookup for name in sections for lookup in SECTIONS[name][0]]
+    queryset = Movie.objects.prefetch_related(*lookups)
+    if 'boxoffice' in sections:
+        queryset = queryset.select_related('boxoffice')
+    return queryset
+
+
+def boxoffice(movie):
+    try:
+        return [movie.boxoffice]
+    except Movie.boxoffice.RelatedObjectDoesNotExist:
+        return []
+
+
+def heatmap(movie):
+    movie_ct = ContentType.objects.get_for_model(Movie)
+    return list(activity.series(movie_ct, movie.pk))
+
+
+def etag(pk, sections):
+    """ETag for the sections of movie `pk` without building them, in one query; None if it does not exist."""
+    models = sorted({model for name in sections for model in SECTIONS[name][1]},
+                    key=lambda model: model._meta.label_lower)
+    counters = {f'{name}_total': COUNTERS[name]() for name in sections if name in COUNTERS}
+    try:
+        row = (Movie.objects.filter(pk=pk).order_by().values('pk')
+               .annotate(reviewed_at=Max('rating_aggregates__updated_at'), **counters)
+               .values_list('updated_at', 'reviewed_at', *counters).first())
+    except (TypeError, ValueError):
+        return None
+    if row is None:
+        return None
+    source = f'{pk}:{",".join(sections)}:{versions.current(models)}:{row}'
+    return f'W/"{hashlib.md5(source.encode()).hexdigest()}"'
@@ -0,0 +1,84 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+
+from movies.models import Movie, Review, TrendingMovie
+
+CRITIC_WEIGHT = 0.6
+AUDIENCE_WEIGHT = 0.4
+TRENDING_SIZE = 8
+
+
+def _average(prefix):
+    return Case(
+        When(**{f'{prefix}_count__gt': 0},
+             then=Cast(F(f'{prefix}_sum'), FloatField()) / F(f'{prefix}_count')),
+        default=0.0,
+        output_field=FloatField(),
+    )
+
+
+def score_expression():
+    # Evaluated by the database so concurrent writers never read-modify-write the score.
+    return _average('critic') * CRITIC_WEIGHT + _average('audience') * AUDIENCE_WEIGHT
+
+
+def compute_score(critic_sum, critic_count, audience_sum, audience_count):
+    critic_avg = critic_sum / critic_count if critic_count else 0
+    audience_avg = audience_sum / audience_count if audience_count else 0
+    return (critic_avg * CRITIC_WEIGHT) + (audience_avg * AUDIENCE_WEIGHT)
+
+
+def apply_review(movie_id, rating, is_critic, sign):
+    """Add (sign=1) or remove (sign=-1) one review's contribution to a movie's entry."""
+    prefix = 'critic' if is_critic else 'audience'
+    changes = {
+        f'{prefix}_sum': F(f'{prefix}_sum') + sign * rating,
+        f'{prefix}_count': F(f'{prefix}_count') + sign,
+    }
+    with transaction.atomic():
+        entry = TrendingMovie.objects.filter(movie_id=movie_id)
+        if not entry.update(**changes):
+            if sign < 0:
+                return
+            TrendingMovie.objects.get_or_create(movie_id=movie_id)
+            entry.update(**changes)
+        entry.update(score=score_expression())
+
+
+def top_movies(limit=TRENDING_SIZE):
+    entries = (TrendingMovie.objects.select_related('movie')
+               .prefetch_related('movie__genres')
+               .order_by('-score', 'movie_id')[:limit])
+    movies = []
+    for entry in entries:
+        entry.movie.trending_score = round(entry.score, 4)
+        movies.append(entry.movie)
+    return movies
+
+
+def rebuild():
+    movie_ct = ContentType.objects.get_for_model(Movie)
+    totals = {
+        row['object_id']: row
+        for row in Review.objects.filter(content_type=movie_ct).values('object_id').annotate(
+            critic_sum=Sum('rating', filter=Q(is_critic=True), default=0),
+            critic_count=Count('id', filter=Q(is_critic=True)),
+            audience_sum=Sum('rating', filter=Q(is_critic=False), default=0),
+            audience_count=Count('id', filter=Q(is_critic=False)),
+        )
+    }
+    entries = []
+    for movie_id in Movie.objects.values_list('id', flat=True).iterator():
+        row = totals.get(movie_id, {})
+        counts = {
+            key: row.get(key, 0)
+            for key in ('critic_sum', 'critic_count', 'audience_sum', 'audience_count')
+        }
+        entries.append(TrendingMovie(movie_id=movie_id, score=compute_score(**counts), **counts))
+
+    with transaction.atomic():
+        TrendingMovie.objects.all().delete()
+        TrendingMovie.objects.bulk_create(entries, batch_size=500)
+    return len(entries)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild item-item recommendation neighbours from review ratings (needs numpy and scipy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=recommendations.NEIGHBOURS,
+                            help="Neighbours kept per title.")
+        parser.add_argument('--chunk-size', type=int, default=recommendations.CHUNK_SIZE,
+                            help="Titles scored per sparse product; lower it to cap peak memory.")
+        parser.add_argument('--max-ratings', type=int, default=recommendations.MAX_RATINGS,
+                            help="Most recent reviews used; lower it to cap the rating matrix.")
+
+    def handle(self, *args, **options):
+        try:
+            count = recommendations.build(options['neighbours'], options['chunk_size'],
+                                          options['max_ratings'])
+        except ImportError as exc:
+            raise CommandError(f"build_recommendations needs numpy and scipy: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} title neighbours."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import polls
+
+
+class Command(BaseCommand):
+    help = ("Write buffered poll vote increments from the cache to PollOption.votes. "
+            "Needs a cache shared with the web workers (Redis, Memcached).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep running and flush every INTERVAL seconds.")
+        parser.add_argument('--recount', action='store_true',
+                            help="After flushing, recount every option from the stored votes.")
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            # This process would only ever see its own, empty, local-memory buffer.
+            if not options['recount']:
+                raise CommandError("The default cache is local memory, which the web workers "
+                                   "do not share; point CACHES at Redis or Memcached first.")
+            self.stdout.write("Local-memory cache: skipping the flush.")
+        else:
+            self.flush(options['interval'])
+
+        if options['recount']:
+            count = polls.recount()
+            self.stdout.write(self.style.SUCCESS(f"Recounted votes for {count} poll options."))
+
+    def flush(self, interval):
+        while True:
+            flushed = polls.flush()
+            self.stdout.write(f"Flushed {flushed} buffered poll votes.")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies import related
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed related-movie neighbours for every movie."
+
+    def handle(self, *args, **options):
+        count = related.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt related movies for {count} movies."))
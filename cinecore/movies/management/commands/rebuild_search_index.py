@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from movies import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the movie, webshow and people search index."
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        backend = "FTS5" if search.uses_fts() else "token table"
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents ({backend})."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies import rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild every webshow's rating rollup from the review table."
+
+    def handle(self, *args, **options):
+        count = rollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating rollups for {count} webshows."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trending movie leaderboard from the review table."
+
+    def handle(self, *args, **options):
+        count = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending leaderboard for {count} movies."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from movies import ratings
+
+
+class Command(BaseCommand):
+    help = "Detect and repair drift between rating aggregates and the review table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report drift, do not repair it.")
+
+    def handle(self, *args, **options):
+        report = ratings.reconcile(repair=not options['dry_run'])
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['drifted']} drifted and {report['missing']} missing rating aggregates."))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_leaderboard(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Movie = apps.get_model('movies', 'Movie')
+    Review = apps.get_model('movies', 'Review')
+    TrendingMovie = apps.get_model('movies', 'TrendingMovie')
+
+    movie_ct = ContentType.objects.filter(app_label='movies', model='movie').first()
+    totals = {}
+    if movie_ct:
+        totals = {
+            row['object_id']: row
+            for row in Review.objects.filter(content_type=movie_ct).values('object_id').annotate(
+                critic_sum=Sum('rating', filter=Q(is_critic=True), default=0),
+                critic_count=Count('id', filter=Q(is_critic=True)),
+                audience_sum=Sum('rating', filter=Q(is_critic=False), default=0),
+                audience_count=Count('id', filter=Q(is_critic=False)),
+            )
+        }
+    entries = []
+    for movie_id in Movie.objects.values_list('id', flat=True):
+        row = totals.get(movie_id, {})
+        critic_sum, critic_count = row.get('critic_sum', 0), row.get('critic_count', 0)
+        audience_sum, audience_count = row.get('audience_sum', 0), row.get('audience_count', 0)
+        critic_avg = critic_sum / critic_count if critic_count else 0
+        audience_avg = audience_sum / audience_count if audience_count else 0
+        entries.append(TrendingMovie(
+            movie_id=movie_id, critic_sum=critic_sum, critic_count=critic_count,
+            audience_sum=audience_sum, audience_count=audience_count,
+            score=critic_avg * 0.6 + audience_avg * 0.4,
+        ))
+    TrendingMovie.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0021_alter_review_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingMovie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('critic_sum', models.PositiveIntegerField(default=0)),
+                ('critic_count', models.PositiveIntegerField(default=0)),
+                ('audience_sum', models.PositiveIntegerField(default=0)),
+                ('audience_count', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', 'movie'], name='trending_score_idx')],
+            },
+        ),
+        migrations.RunPython(build_leaderboard, migrations.RunPython.noop),
+    ]
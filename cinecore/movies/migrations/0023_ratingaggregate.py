@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_aggregates(apps, schema_editor):
+    Review = apps.get_model('movies', 'Review')
+    RatingAggregate = apps.get_model('movies', 'RatingAggregate')
+
+    counters = {
+        'critic_count': Count('id', filter=Q(is_critic=True)),
+        'critic_sum': Sum('rating', filter=Q(is_critic=True), default=0),
+        'audience_count': Count('id', filter=Q(is_critic=False)),
+        'audience_sum': Sum('rating', filter=Q(is_critic=False), default=0),
+    }
+    for stars in range(1, 6):
+        counters[f'rating_{stars}'] = Count('id', filter=Q(rating=stars))
+
+    rows = Review.objects.order_by().values('content_type_id', 'object_id').annotate(**counters)
+    RatingAggregate.objects.bulk_create((RatingAggregate(**row) for row in rows), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0022_trendingmovie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('critic_count', models.PositiveIntegerField(default=0)),
+                ('critic_sum', models.PositiveIntegerField(default=0)),
+                ('audience_count', models.PositiveIntegerField(default=0)),
+                ('audience_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_buckets(apps, schema_editor):
+    Review = apps.get_model('movies', 'Review')
+    ReviewDailyBucket = apps.get_model('movies', 'ReviewDailyBucket')
+
+    rows = (Review.objects.order_by().annotate(date=TruncDate('timestamp'))
+            .values('content_type_id', 'object_id', 'date')
+            .annotate(count=Count('id'), rating_sum=Sum('rating')))
+    ReviewDailyBucket.objects.bulk_create((ReviewDailyBucket(**row) for row in rows), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0024_review_target_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewDailyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id', 'date')},
+            },
+        ),
+        migrations.RunPython(build_buckets, migrations.RunPython.noop),
+    ]
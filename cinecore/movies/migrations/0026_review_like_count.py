@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    Review = apps.get_model('movies', 'Review')
+    ReviewLike = apps.get_model('movies', 'ReviewLike')
+
+    likes = (ReviewLike.objects.filter(review=OuterRef('pk')).order_by()
+             .values('review').annotate(count=Count('id')).values('count'))
+    Review.objects.update(like_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0025_reviewdailybucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_target_recent_idx',
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['content_type', 'object_id', '-timestamp', '-id'], name='review_target_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['content_type', 'object_id', '-like_count', '-timestamp', '-id'], name='review_target_popular_idx'),
+        ),
+    ]
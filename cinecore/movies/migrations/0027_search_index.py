@@ -0,0 +1,139 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+
+# Frozen copy of the movies.search indexing rules at the time of this migration, so
+# later changes to that module can't break or alter this backfill.
+FTS_TABLE = 'movies_search_fts'
+TITLE_WEIGHT = 10
+BODY_WEIGHT = 1
+MAX_TOKEN_LENGTH = 64
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    except OperationalError:
+        pass  # SQLite compiled without FTS5; the token table is used instead.
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [token[:MAX_TOKEN_LENGTH] for token in re.findall(r'\w+', text)]
+
+
+def postings(title, body):
+    weights = {}
+    for token in tokenize(body):
+        weights[token] = BODY_WEIGHT
+    for token in tokenize(title):
+        weights[token] = TITLE_WEIGHT
+    return weights
+
+
+def join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def movie_document(movie):
+    people = [role.person.name for role in movie.movie_role.all()]
+    platforms = [platform.name for platform in movie.streaming_platform.all()]
+    return movie.title, join(movie.short_synopsis, movie.full_synopsis, *platforms, *people)
+
+
+def webshow_document(show):
+    people = [role.person.name for role in show.webshow_role.all()]
+    people += [person.name for person in show.creator.all()]
+    platforms = [platform.name for platform in show.streaming_platform.all()]
+    return show.title, join(show.short_synopsis, show.full_synopsis, *platforms, *people)
+
+
+def person_document(person):
+    return person.name, person.bio or ''
+
+
+def build_index(apps, schema_editor):
+    connection = schema_editor.connection
+    SearchDocument = apps.get_model('movies', 'SearchDocument')
+    SearchToken = apps.get_model('movies', 'SearchToken')
+    fts = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    kinds = {
+        'movie': ('Movie', movie_document, ('movie_role__person', 'streaming_platform')),
+        'webshow': ('WebShow', webshow_document,
+                    ('webshow_role__person', 'creator', 'streaming_platform')),
+        'person': ('Person', person_document, ()),
+    }
+    for kind, (model_name, build, prefetch) in kinds.items():
+        objects = apps.get_model('movies', model_name).objects.prefetch_related(*prefetch)
+        documents = [SearchDocument(kind=kind, object_id=obj.pk, title=title, body=body)
+                     for obj in objects.iterator(chunk_size=500)
+                     for title, body in [build(obj)]]
+        documents = SearchDocument.objects.bulk_create(documents, batch_size=500)
+        if documents and documents[0].pk is None:  # Backends without RETURNING.
+            documents = list(SearchDocument.objects.filter(kind=kind))
+        if fts:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                    [(document.pk, document.title, document.body) for document in documents])
+        else:
+            SearchToken.objects.bulk_create(
+                (SearchToken(document_id=document.pk, token=token, weight=weight)
+                 for document in documents
+                 for token, weight in postings(document.title, document.body).items()),
+                batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0026_review_like_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('movie', 'Movie'), ('webshow', 'Web show'), ('person', 'Person')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='movies.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'document'], name='search_token_idx')],
+                'unique_together': {('document', 'token')},
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+import heapq
+import math
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of the movies.related scoring at the time of this migration.
+WEIGHTS = {'genre': 3.0, 'person': 2.0, 'language': 1.0, 'platform': 0.5}
+NEIGHBOURS = 20
+MAX_POSTING = 5000
+
+
+def build_neighbours(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    PersonRole = apps.get_model('movies', 'PersonRole')
+    RelatedMovie = apps.get_model('movies', 'RelatedMovie')
+    sources = {
+        'genre': (Movie.genres.through.objects, 'genre_id'),
+        'language': (Movie.languages.through.objects, 'language_id'),
+        'platform': (Movie.streaming_platform.through.objects, 'platform_id'),
+        'person': (PersonRole.objects.filter(movie__isnull=False), 'person_id'),
+    }
+    features = defaultdict(list)
+    postings = defaultdict(set)
+    for kind, (rows, column) in sources.items():
+        for movie_id, feature_id in rows.order_by().values_list('movie_id', column).distinct():
+            features[movie_id].append((kind, feature_id))
+            postings[kind, feature_id].add(movie_id)
+    total = Movie.objects.count()
+
+    entries = []
+    for movie_id, own in features.items():
+        scores = defaultdict(float)
+        for feature in own:
+            movies = postings[feature]
+            if len(movies) < 2 or len(movies) > MAX_POSTING:
+                continue
+            weight = WEIGHTS[feature[0]] * math.log(1 + total / len(movies))
+            for other in movies:
+                if other != movie_id:
+                    scores[other] += weight
+        top = heapq.nlargest(NEIGHBOURS, scores.items(), key=lambda item: (item[1], -item[0]))
+        entries += [RelatedMovie(movie_id=movie_id, related_id=other, score=score)
+                    for other, score in top]
+    RelatedMovie.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0027_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedMovie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='movies.movie')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['movie', '-score'], name='related_movie_score_idx')],
+                'unique_together': {('movie', 'related')},
+            },
+        ),
+        migrations.RunPython(build_neighbours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:19
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+# Frozen copy of the movies.rollup weights at the time of this migration.
+WEIGHTS = {'show': 0.5, 'season': 0.3, 'episode': 0.2}
+
+
+def build_rollups(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    WebShow = apps.get_model('movies', 'WebShow')
+    WebSeason = apps.get_model('movies', 'WebSeason')
+    Episode = apps.get_model('movies', 'Episode')
+    Review = apps.get_model('movies', 'Review')
+    ShowRating = apps.get_model('movies', 'ShowRating')
+
+    owners = {
+        'show': None,
+        'season': dict(WebSeason.objects.values_list('pk', 'webshow_id')),
+        'episode': dict(Episode.objects.values_list('pk', 'season__webshow_id')),
+    }
+    totals = defaultdict(lambda: defaultdict(int))
+    for level, model in (('show', 'webshow'), ('season', 'webseason'), ('episode', 'episode')):
+        content_type = ContentType.objects.filter(app_label='movies', model=model).first()
+        if content_type is None:
+            continue
+        rows = (Review.objects.filter(content_type=content_type).order_by().values('object_id')
+                .annotate(total=Sum('rating'), count=Count('id')))
+        for row in rows:
+            show_id = row['object_id'] if owners[level] is None else owners[level].get(row['object_id'])
+            if show_id is not None:
+                totals[show_id][f'{level}_sum'] += row['total']
+                totals[show_id][f'{level}_count'] += row['count']
+
+    entries = []
+    for show_id in WebShow.objects.values_list('pk', flat=True).iterator():
+        row = totals[show_id]
+        weighted = [(weight, row[f'{level}_sum'] / row[f'{level}_count'])
+                    for level, weight in WEIGHTS.items() if row.get(f'{level}_count')]
+        score = (sum(weight * average for weight, average in weighted) / sum(w for w, _ in weighted)
+                 if weighted else 0.0)
+        entries.append(ShowRating(webshow_id=show_id, score=score, **row))
+    ShowRating.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0030_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('show_sum', models.PositiveIntegerField(default=0)),
+                ('show_count', models.PositiveIntegerField(default=0)),
+                ('season_sum', models.PositiveIntegerField(default=0)),
+                ('season_count', models.PositiveIntegerField(default=0)),
+                ('episode_sum', models.PositiveIntegerField(default=0)),
+                ('episode_count', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('webshow', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='movies.webshow')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', 'webshow'], name='show_rating_score_idx')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0031_show_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showrating',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -78,7 +78,21 @@ class Person(models.Model):
     def __str__(self):
         return self.name
 
-class Review(models.Model):
+class CounterFieldsMixin:
+    """Leave F()-maintained counter columns out of saves of existing rows.
+
+    Counters are only ever changed with atomic UPDATE ... SET n = n + 1 statements, so
+    re-saving an instance loaded earlier must not write its stale copy back.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+class Review(CounterFieldsMixin, models.Model):
     review_user=models.ForeignKey(User,on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id=models.PositiveIntegerField()
@@ -87,13 +101,58 @@ class Review(models.Model):
     rating=models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     is_critic=models.BooleanField(default=False)
     timestamp=models.DateTimeField(auto_now_add=True)
+    like_count=models.PositiveIntegerField(default=0)
+    counter_fields = ('like_count',)
 
     class Meta:
         unique_together = ('review_user', 'content_type', 'object_id') 
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-timestamp', '-id'],
+                         name='review_target_recent_idx'),
+            models.Index(fields=['content_type', 'object_id', 'is_critic', 'rating'],
+                         name='review_target_rating_idx'),
+            models.Index(fields=['content_type', 'object_id', '-like_count', '-timestamp', '-id'],
+                         name='review_target_popular_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.review_user.username} - {self.rating}/5"
     
+class RatingAggregate(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    critic_count = models.PositiveIntegerField(default=0)
+    critic_sum = models.PositiveIntegerField(default=0)
+    audience_count = models.PositiveIntegerField(default=0)
+    audience_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # When any review (or review like) of the title last changed; see ratings.touch.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+
+    def __str__(self):
+        return f"Ratings for {self.content_type.model} #{self.object_id}"
+
+class ReviewDailyBucket(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'date')
+
+    def __str__(self):
+        return f"{self.count} reviews for {self.content_type.model} #{self.object_id} on {self.date}"
+
 class ReviewLike(models.Model):
     
     like_user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -116,16 +175,33 @@ class Movie(models.Model):
     runtime=models.IntegerField()
     genres=models.ManyToManyField(Genre)
     reviews = GenericRelation(Review)
+    rating_aggregates = GenericRelation(RatingAggregate)
+    review_buckets = GenericRelation(ReviewDailyBucket)
     languages=models.ManyToManyField(Language,related_name='movies')
     trailer=models.URLField(blank=True, null=True)
     subtitles=models.ManyToManyField(Language,related_name='movies_subtitles')
     streaming_platform=models.ManyToManyField(Platform,blank=True,null=True,default='Not streaming.')
     is_active=models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
     def __str__(self):
         return f"{self.title} ({self.release_date.year if self.release_date else 'N/A'})"
 
+class TrendingMovie(models.Model):
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name="trending")
+    critic_sum = models.PositiveIntegerField(default=0)
+    critic_count = models.PositiveIntegerField(default=0)
+    audience_sum = models.PositiveIntegerField(default=0)
+    audience_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-score', 'movie'], name='trending_score_idx')]
+
+    def __str__(self):
+        return f"Trending {self.movie.title}: {self.score:.4f}"
+
 class MovieTrivia(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="trivia")
     fact = models.TextField()
@@ -165,12 +241,13 @@ class Award(models.Model):
         status = "Won" if self.won else "Nominated"
         return f"{self.movie.title} - {self.name} ({self.category}, {self.year}) [{status}]"
 
-class FanTheory(models.Model):
+class FanTheory(CounterFieldsMixin, models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="fantheories")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     theory = models.TextField(max_length=200)
     upvotes = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    counter_fields = ('upvotes',)
     
     def __str__(self):
         return f"Theory by {self.user.username} on {self.movie.title} ({self.upvotes} upvotes)"
@@ -179,6 +256,7 @@ class FanTheoryVote(models.Model):
     theory = models.ForeignKey(FanTheory, related_name='votes', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     points = models.PositiveIntegerField(default=0)
+    MAX_POINTS = 5
 
     class Meta:
         unique_together = ('theory', 'user') 
@@ -226,6 +304,8 @@ class WebShow(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     reviews = GenericRelation(Review)  
+    rating_aggregates = GenericRelation(RatingAggregate)
+    review_buckets = GenericRelation(ReviewDailyBucket)
     
     def __str__(self):
         return f"WebShow: {self.title}"
@@ -240,6 +320,8 @@ class WebSeason(models.Model):
     total_episodes=models.IntegerField()
     release_date=models.DateField()
     reviews = GenericRelation(Review)  
+    rating_aggregates = GenericRelation(RatingAggregate)
+    review_buckets = GenericRelation(ReviewDailyBucket)
     
     class Meta:
         unique_together = ('webshow', 'season_number')
@@ -253,6 +335,8 @@ class Episode(models.Model):
     episode_number=models.PositiveIntegerField()
     title=models.CharField(max_length=150)
     reviews = GenericRelation(Review)
+    rating_aggregates = GenericRelation(RatingAggregate)
+    review_buckets = GenericRelation(ReviewDailyBucket)
     description=models.TextField()
     release_date=models.DateField()
     thumbnail_img=models.ImageField(upload_to='webshow_media/episode_thumbnails/',
@@ -281,3 +365,80 @@ class PersonRole(models.Model):
         content = self.movie.title if self.movie else self.webshow.title
         return f"{self.person.name} - {self.get_role_display()} in {content}"
 
+
+
+class SearchDocument(models.Model):
+    """Denormalized text of one searchable movie, webshow or person; see movies.search."""
+    MOVIE = 'movie'
+    WEBSHOW = 'webshow'
+    PERSON = 'person'
+    KINDS = [(MOVIE, 'Movie'), (WEBSHOW, 'Web show'), (PERSON, 'Person')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
+
+
+class SearchToken(models.Model):
+    """Inverted index postings, used when the database has no FTS5."""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('document', 'token')
+        indexes = [models.Index(fields=['token', 'document'], name='search_token_idx')]
+
+
+class RelatedMovie(models.Model):
+    """Precomputed top-K neighbours of a movie; maintained by movies.related."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbours')
+    related = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('movie', 'related')
+        indexes = [models.Index(fields=['movie', '-score'], name='related_movie_score_idx')]
+
+    def __str__(self):
+        return f"{self.movie_id} -> {self.related_id} ({self.score:.2f})"
+
+
+class ItemSimilarity(models.Model):
+    """Top-K item-item neighbours from review ratings; rebuilt by build_recommendations."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    similar_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    similar_object_id = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['content_type', 'object_id', '-score'],
+                                name='item_similarity_idx')]
+
+
+class ShowRating(models.Model):
+    """A webshow's review totals per level and their weighted rollup; maintained by movies.rollup."""
+    webshow = models.OneToOneField(WebShow, on_delete=models.CASCADE, related_name='rollup')
+    show_sum = models.PositiveIntegerField(default=0)
+    show_count = models.PositiveIntegerField(default=0)
+    season_sum = models.PositiveIntegerField(default=0)
+    season_count = models.PositiveIntegerField(default=0)
+    episode_sum = models.PositiveIntegerField(default=0)
+    episode_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    # When any rating in the show's tree last changed; see movies.tree.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-score', 'webshow'], name='show_rating_score_idx')]
+
+    def __str__(self):
+        return f"Rating for webshow #{self.webshow_id}: {self.score:.2f}"
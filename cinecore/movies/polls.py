@@ -0,0 +1,253 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Prefetch, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from movies.models import Poll, PollOption, PollVote
+
+# Buffered mode keeps per-option increments in the cache and registers each option in
+# an append-only slot list when its pending count leaves zero, so flushes never have
+# to scan options and concurrent voters never race on a shared set.
+PENDING_KEY = 'polls:pending:{}'
+SLOTS_KEY = 'polls:pending-slots'
+SLOT_KEY = 'polls:pending-slot:{}'
+FLUSHED_KEY = 'polls:flushed-slot'
+FLUSH_LOCK_KEY = 'polls:flush-lock'
+# A voter takes a slot number and then fills the slot, so a flush can find one still
+# empty. Flushes stop in front of it, and only skip it once it has stayed empty for
+# SLOT_GRACE seconds (its voter died; `flush_poll_votes --recount` repairs the count).
+GAP_KEY = 'polls:pending-gap:{}'
+SLOT_GRACE = 60
+
+# Result tallies: the poll's option list, plus one counter and one change stamp per
+# option. Votes bump the counter with cache.incr, so hot polls are never re-read from
+# the database; the timeout bounds any drift from a vote racing a reload.
+TALLY_KEY = 'polls:tally:{}'
+COUNT_KEY = 'polls:count:{}'
+CHANGED_KEY = 'polls:changed:{}'
+TALLY_TIMEOUT = 60
+
+
+class AlreadyVoted(Exception):
+    pass
+
+
+def buffered():
+    return getattr(settings, 'POLL_VOTES_BUFFERED', False)
+
+
+def cast_vote(option, user):
+    """Record `user`'s vote for `option` and return the option's running vote count.
+
+    The unique (user, poll) constraint is the duplicate check, so two parallel votes
+    from one user cannot both land; the counter moves with F() in the same transaction,
+    or through the cache buffer when POLL_VOTES_BUFFERED is on.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                PollVote.objects.create(user=user, poll_id=option.poll_id, option=option)
+        except IntegrityError:
+            raise AlreadyVoted
+        if not buffered():
+            PollOption.objects.filter(pk=option.pk).update(votes=F('votes') + 1)
+
+    _tally_vote(option.pk)
+    if buffered():
+        _buffer_increment(option.pk)
+        maybe_flush()
+    # Read the stored count before the pending one: a flush in between can only make
+    # the figure briefly low, never count the same votes twice.
+    option.refresh_from_db(fields=['votes'])
+    return option.votes + pending_votes([option.pk]).get(option.pk, 0)
+
+
+def _register(option_id):
+    slot = _incr(SLOTS_KEY)
+    cache.set(SLOT_KEY.format(slot), option_id, timeout=None)
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key, delta)
+
+
+def _buffer_increment(option_id):
+    pending = _incr(PENDING_KEY.format(option_id))
+    if pending == 1:
+        _register(option_id)
+    return pending
+
+
+def pending_votes(option_ids):
+    """Buffered increments not yet flushed to PollOption.votes, keyed by option id."""
+    if not buffered():
+        return {}
+    keys = {PENDING_KEY.format(option_id): option_id for option_id in option_ids}
+    return {keys[key]: count for key, count in cache.get_many(keys).items() if count}
+
+
+def maybe_flush():
+    """Flush at most once per POLL_VOTES_FLUSH_INTERVAL seconds across all workers."""
+    interval = getattr(settings, 'POLL_VOTES_FLUSH_INTERVAL', 5)
+    if cache.add(FLUSH_LOCK_KEY, True, timeout=interval):
+        return flush()
+    return 0
+
+
+def flush():
+    """Move buffered increments into PollOption.votes with a single UPDATE."""
+    last = cache.get(FLUSHED_KEY, 0)
+    top = cache.get(SLOTS_KEY, 0)
+    if top <= last:
+        return 0
+    keys = [SLOT_KEY.format(slot) for slot in range(last + 1, top + 1)]
+    slots = cache.get_many(keys)
+    done = last
+    for slot, key in enumerate(keys, last + 1):
+        if key not in slots and not _abandoned(slot):
+            break
+        done = slot
+    if done == last:
+        return 0
+    flushed = keys[:done - last]
+    cache.set(FLUSHED_KEY, done, timeout=None)
+    cache.delete_many(flushed)
+
+    increments = {}
+    for option_id in {slots[key] for key in flushed if key in slots}:
+        key = PENDING_KEY.format(option_id)
+        claimed, remaining = _claim(key, cache.get(key, 0))
+        # A remainder means votes arrived since the get; they need a slot for the next flush.
+        if remaining > 0:
+            _register(option_id)
+        if claimed:
+            increments[option_id] = claimed
+
+    if increments:
+        delta = Case(*(When(pk=option_id, then=Value(count))
+                       for option_id, count in increments.items()),
+                     default=Value(0), output_field=IntegerField())
+        PollOption.objects.filter(pk__in=increments).update(votes=F('votes') + delta)
+    return sum(increments.values())
+
+
+def _abandoned(slot):
+    """Whether an empty slot has been empty for longer than SLOT_GRACE."""
+    key = GAP_KEY.format(slot)
+    cache.add(key, time.time(), timeout=None)
+    if time.time() - cache.get(key, time.time()) <= SLOT_GRACE:
+        return False
+    cache.delete(key)
+    return True
+
+
+def _claim(key, count):
+    """Take up to `count` pending votes off `key`; returns (claimed, remaining).
+
+    Flushes can overlap (the command next to a request-path flush, or a flush outliving
+    its lock) and read the same count. decr is atomic, so whoever drives the counter
+    below zero claimed votes another flush already took, and hands that excess back.
+    """
+    if not count:
+        return 0, 0
+    remaining = cache.decr(key, count)
+    if remaining >= 0:
+        return count, remaining
+    cache.incr(key, -remaining)
+    return max(count + remaining, 0), 0
+
+
+def recount(poll_ids=None):
+    """Reset PollOption.votes from the PollVote rows, e.g. after the cache lost a buffer."""
+    options = PollOption.objects.all()
+    if poll_ids is not None:
+        options = options.filter(poll_id__in=poll_ids)
+    votes = (PollVote.objects.filter(option=OuterRef('pk')).order_by()
+             .values('option').annotate(total=Count('id')).values('total'))
+    return options.update(votes=Coalesce(Subquery(votes), 0))
+
+
+def _version():
+    return time.time_ns() // 1000
+
+
+def _tally_vote(option_id):
+    try:
+        cache.incr(COUNT_KEY.format(option_id))
+    except ValueError:
+        return  # Not cached; the next read loads the committed count.
+    cache.set(CHANGED_KEY.format(option_id), _version(), timeout=TALLY_TIMEOUT)
+
+
+def invalidate(poll_id):
+    cache.delete(TALLY_KEY.format(poll_id))
+
+
+def _tally_keys(tally):
+    return [key.format(option_id) for option_id, _ in tally['options']
+            for key in (COUNT_KEY, CHANGED_KEY)]
+
+
+def _load_tally(poll_id):
+    options = Prefetch('options', queryset=PollOption.objects.order_by('pk'))
+    poll = Poll.objects.filter(pk=poll_id).prefetch_related(options).first()
+    if poll is None:
+        return None, None
+    options = list(poll.options.all())
+    pending = pending_votes([option.pk for option in options])
+    version = _version()
+    values = {}
+    for option in options:
+        values[COUNT_KEY.format(option.pk)] = option.votes + pending.get(option.pk, 0)
+        values[CHANGED_KEY.format(option.pk)] = version
+    tally = {
+        'movie_id': poll.movie_id,
+        'question': poll.question,
+        'options': [(option.pk, option.option_text) for option in options],
+    }
+    cache.set_many(values, timeout=TALLY_TIMEOUT)
+    cache.set(TALLY_KEY.format(poll_id), tally, timeout=TALLY_TIMEOUT)
+    return tally, values
+
+
+def results(poll_id, since=None):
+    """Totals and percentages for a poll, served from the cached tally.
+
+    With `since` (a previous response's `version`), only options whose count changed
+    after that version are listed; `percentages` always covers every option.
+    Returns None for an unknown poll.
+    """
+    tally = cache.get(TALLY_KEY.format(poll_id))
+    values = cache.get_many(_tally_keys(tally)) if tally else {}
+    if tally is None or len(values) != len(_tally_keys(tally)):
+        # First read, or the counters expired ahead of the option list.
+        tally, values = _load_tally(poll_id)
+        if tally is None:
+            return None
+
+    counts = {option_id: values[COUNT_KEY.format(option_id)] for option_id, _ in tally['options']}
+    changed = {option_id: values[CHANGED_KEY.format(option_id)] for option_id, _ in tally['options']}
+    total = sum(counts.values())
+    percentages = {option_id: round(100 * votes / total, 1) if total else 0
+                   for option_id, votes in counts.items()}
+    options = [
+        {'id': option_id, 'option_text': text, 'votes': counts[option_id],
+         'percentage': percentages[option_id]}
+        for option_id, text in tally['options']
+        if since is None or changed[option_id] > since
+    ]
+    data = {
+        'poll': poll_id,
+        'movie': tally['movie_id'],
+        'question': tally['question'],
+        'version': max(changed.values(), default=0),
+        'total': total,
+        'options': options,
+    }
+    if since is not None:
+        data['percentages'] = {str(option_id): value for option_id, value in percentages.items()}
+    return data
@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Now
+
+from movies.models import RatingAggregate, Review
+
+STARS = range(1, 6)
+COUNTERS = ('critic_count', 'critic_sum', 'audience_count', 'audience_sum',
+            *(f'rating_{stars}' for stars in STARS))
+
+
+def review_aggregates():
+    """Conditional aggregates that rebuild RatingAggregate counters from Review rows."""
+    fields = {
+        'critic_count': Count('id', filter=Q(is_critic=True)),
+        'critic_sum': Sum('rating', filter=Q(is_critic=True), default=0),
+        'audience_count': Count('id', filter=Q(is_critic=False)),
+        'audience_sum': Sum('rating', filter=Q(is_critic=False), default=0),
+    }
+    for stars in STARS:
+        fields[f'rating_{stars}'] = Count('id', filter=Q(rating=stars))
+    return fields
+
+
+def apply_review(content_type_id, object_id, rating, is_critic, sign):
+    """Add (sign=1) or remove (sign=-1) one review's contribution to its title's aggregate."""
+    prefix = 'critic' if is_critic else 'audience'
+    changes = {
+        f'{prefix}_sum': F(f'{prefix}_sum') + sign * rating,
+        f'{prefix}_count': F(f'{prefix}_count') + sign,
+        'updated_at': Now(),
+    }
+    if rating in STARS:
+        changes[f'rating_{rating}'] = F(f'rating_{rating}') + sign
+
+    with transaction.atomic():
+        aggregate = RatingAggregate.objects.filter(content_type_id=content_type_id,
+                                                   object_id=object_id)
+        if not aggregate.update(**changes) and sign > 0:
+            RatingAggregate.objects.get_or_create(content_type_id=content_type_id,
+                                                  object_id=object_id)
+            aggregate.update(**changes)
+
+
+def touch(content_type_id, object_id):
+    """Mark the title's reviews as changed without touching its counters (text edits, likes)."""
+    RatingAggregate.objects.filter(content_type_id=content_type_id,
+                                   object_id=object_id).update(updated_at=Now())
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else 0
+
+
+def summarize(aggregate):
+    if aggregate is None:
+        aggregate = RatingAggregate()
+    return {
+        "critic": {
+            "avg": _average(aggregate.critic_sum, aggregate.critic_count),
+            "count": aggregate.critic_count,
+        },
+        "audience": {
+            "avg": _average(aggregate.audience_sum, aggregate.audience_count),
+            "count": aggregate.audience_count,
+        },
+        "distribution": {str(stars): getattr(aggregate, f'rating_{stars}') for stars in STARS},
+    }
+
+
+def compute_summary(content_type, object_id):
+    """Summary straight from the review table, in a single conditional-aggregation query."""
+    counters = Review.objects.filter(content_type=content_type,
+                                     object_id=object_id).aggregate(**review_aggregates())
+    return summarize(RatingAggregate(**counters))
+
+
+def get_summary(content_type, object_id):
+    aggregate = RatingAggregate.objects.filter(content_type=content_type,
+                                               object_id=object_id).first()
+    if aggregate is None:
+        # Titles reviewed before their aggregate row existed; reconcile_ratings backfills these.
+        return compute_summary(content_type, object_id)
+    return summarize(aggregate)
+
+
+def summary_for_object(obj):
+    """Summary for a movie/webshow/season/episode, using a `rating_aggregates` prefetch if present."""
+    aggregates = list(obj.rating_aggregates.all())
+    return summarize(aggregates[0] if aggregates else None)
+
+
+def reconcile(repair=True):
+    """Compare every stored aggregate with the review table and optionally fix drift."""
+    expected = {}
+    rows = (Review.objects.order_by().values('content_type', 'object_id')
+            .annotate(**review_aggregates()))
+    for row in rows.iterator():
+        key = (row.pop('content_type'), row.pop('object_id'))
+        expected[key] = row
+
+    drifted = []
+    for aggregate in RatingAggregate.objects.iterator():
+        key = (aggregate.content_type_id, aggregate.object_id)
+        counters = expected.pop(key, dict.fromkeys(COUNTERS, 0))
+        if any(getattr(aggregate, name) != counters[name] for name in COUNTERS):
+            for name in COUNTERS:
+                setattr(aggregate, name, counters[name])
+            drifted.append(aggregate)
+
+    missing = [
+        RatingAggregate(content_type_id=content_type_id, object_id=object_id, **counters)
+        for (content_type_id, object_id), counters in expected.items()
+    ]
+
+    if repair:
+        with transaction.atomic():
+            RatingAggregate.objects.bulk_update(drifted, COUNTERS, batch_size=500)
+            RatingAggregate.objects.bulk_create(missing, batch_size=500)
+    return {"drifted": len(drifted), "missing": len(missing)}
@@ -0,0 +1,176 @@
+from array import array
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+
+from movies import leaderboard
+from movies.models import ItemSimilarity, Movie, Review, WebSeason, WebShow
+
+# Titles that can be recommended, with the `type` label used in API payloads.
+TITLE_TYPES = {Movie: 'movie', WebShow: 'webshow', WebSeason: 'season'}
+NEIGHBOURS = 20
+CHUNK_SIZE = 500
+# Reviews in the rating matrix; with CHUNK_SIZE this caps the job's peak memory at
+# a few hundred MB however large the review table grows.
+MAX_RATINGS = 5_000_000
+HISTORY = 200
+
+
+def title_content_types():
+    return ContentType.objects.get_for_models(*TITLE_TYPES)
+
+
+def _load_ratings(content_type_ids, limit):
+    """User ids, content type ids, object ids and ratings of the latest `limit` reviews.
+
+    Reviews are streamed into typed arrays (a few bytes per review) rather than model
+    instances, so millions of reviews fit comfortably in memory.
+    """
+    users, types, objects, ratings = array('q'), array('q'), array('q'), array('f')
+    rows = (Review.objects.filter(content_type_id__in=content_type_ids).order_by('-id')
+            .values_list('review_user_id', 'content_type_id', 'object_id', 'rating')[:limit])
+    for user_id, content_type_id, object_id, rating in rows.iterator(chunk_size=20000):
+        users.append(user_id)
+        types.append(content_type_id)
+        objects.append(object_id)
+        ratings.append(rating)
+    return users, types, objects, ratings
+
+
+def build(neighbours=NEIGHBOURS, chunk_size=CHUNK_SIZE, max_ratings=MAX_RATINGS):
+    """Rebuild ItemSimilarity from review ratings with adjusted-cosine similarity.
+
+    Ratings are centred on each user's mean and the item vectors L2-normalised, so
+    one sparse product X @ X.T gives every cosine. Only the latest `max_ratings`
+    reviews enter the matrix and the product is computed for `chunk_size` items at
+    a time, so both bound peak memory; each item keeps its top `neighbours`
+    positive scores.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    content_types = {ct.id: ct for ct in title_content_types().values()}
+    users, types, objects, ratings = _load_ratings(list(content_types), max_ratings)
+    if not ratings:
+        ItemSimilarity.objects.all().delete()
+        return 0
+
+    user_ids = np.frombuffer(users, dtype=np.int64)
+    item_keys = (np.frombuffer(types, dtype=np.int64) << 32) | np.frombuffer(objects, dtype=np.int64)
+    values = np.frombuffer(ratings, dtype=np.float32).astype(np.float64)
+    del users, types, objects, ratings
+
+    items, item_index = np.unique(item_keys, return_inverse=True)
+    _, user_index = np.unique(user_ids, return_inverse=True)
+    del item_keys, user_ids
+
+    # A user who reviewed the same title twice counts once, with their mean rating.
+    matrix = sparse.coo_matrix((values, (item_index, user_index))).tocsr()
+    counts = sparse.coo_matrix((np.ones_like(values), (item_index, user_index))).tocsr()
+    matrix.data /= counts.data
+    del counts, values, item_index, user_index
+
+    by_user = matrix.tocsc()
+    user_totals = np.asarray(by_user.sum(axis=0)).ravel()
+    user_counts = np.diff(by_user.indptr)
+    means = np.divide(user_totals, user_counts, out=np.zeros_like(user_totals),
+                      where=user_counts > 0)
+    matrix.data -= means[matrix.indices]
+    matrix.eliminate_zeros()
+    del by_user
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms) @ matrix
+    transposed = matrix.T.tocsc()
+
+    item_types = (items >> 32).astype(np.int64)
+    item_objects = (items & 0xFFFFFFFF).astype(np.int64)
+    written = 0
+    with transaction.atomic():
+        ItemSimilarity.objects.all().delete()
+        for start in range(0, matrix.shape[0], chunk_size):
+            scores = (matrix[start:start + chunk_size] @ transposed).tocsr()
+            rows = []
+            for offset in range(scores.shape[0]):
+                item = start + offset
+                begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+                others, similarity = scores.indices[begin:end], scores.data[begin:end]
+                keep = (others != item) & (similarity > 0)
+                others, similarity = others[keep], similarity[keep]
+                if len(others) > neighbours:
+                    best = np.argpartition(-similarity, neighbours)[:neighbours]
+                    others, similarity = others[best], similarity[best]
+                for other, score in zip(others.tolist(), similarity.tolist()):
+                    rows.append(ItemSimilarity(
+                        content_type_id=int(item_types[item]), object_id=int(item_objects[item]),
+                        similar_content_type_id=int(item_types[other]),
+                        similar_object_id=int(item_objects[other]), score=score))
+            ItemSimilarity.objects.bulk_create(rows, batch_size=1000)
+            written += len(rows)
+    return written
+
+
+def _labels(keys, content_types):
+    """{(content_type_id, object_id): (type, title)} for the given titles."""
+    wanted = defaultdict(list)
+    for content_type_id, object_id in keys:
+        wanted[content_type_id].append(object_id)
+    labels = {}
+    for model, kind in TITLE_TYPES.items():
+        content_type = content_types[model]
+        if not wanted.get(content_type.id):
+            continue
+        titles = model.objects.filter(pk__in=wanted[content_type.id])
+        if model is WebSeason:
+            titles = titles.select_related('webshow')
+        for title in titles:
+            label = (f'{title.webshow.title} - Season {title.season_number}'
+                     if model is WebSeason else title.title)
+            labels[content_type.id, title.pk] = (kind, label)
+    return labels
+
+
+def for_user(user, limit=20):
+    """Personalised titles from the neighbours of what `user` has reviewed.
+
+    Each candidate scores the similarity-weighted sum of the user's centred ratings of
+    the titles it neighbours; titles the user already reviewed are excluded. Users
+    without reviews get the trending leaderboard instead.
+    """
+    content_types = title_content_types()
+    history = list(Review.objects.filter(review_user=user,
+                                         content_type__in=content_types.values())
+                   .order_by('-timestamp')
+                   .values_list('content_type_id', 'object_id', 'rating')[:HISTORY])
+    if not history:
+        return 'trending', [
+            {'type': 'movie', 'id': movie.pk, 'title': movie.title, 'score': movie.trending_score}
+            for movie in leaderboard.top_movies(limit)]
+
+    mean = sum(rating for _, _, rating in history) / len(history)
+    rated = {(content_type_id, object_id): rating - mean
+             for content_type_id, object_id, rating in history}
+    by_type = defaultdict(list)
+    for content_type_id, object_id in rated:
+        by_type[content_type_id].append(object_id)
+    sources = Q()
+    for content_type_id, object_ids in by_type.items():
+        sources |= Q(content_type_id=content_type_id, object_id__in=object_ids)
+
+    scores = defaultdict(float)
+    for row in ItemSimilarity.objects.filter(sources).values_list(
+            'content_type_id', 'object_id', 'similar_content_type_id', 'similar_object_id', 'score'):
+        candidate = row[2], row[3]
+        if candidate not in rated:
+            # Neutral ratings (exactly the user's mean) still vote, just weakly.
+            scores[candidate] += row[4] * (rated[row[0], row[1]] or 0.1)
+
+    ranked = sorted(((key, score) for key, score in scores.items() if score > 0),
+                    key=lambda item: -item[1])[:limit]
+    labels = _labels([key for key, _ in ranked], content_types)
+    return 'personal', [
+        {'type': labels[key][0], 'id': key[1], 'title': labels[key][1], 'score': round(score, 4)}
+        for key, score in ranked if key in labels]
@@ -0,0 +1,135 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from movies.models import Movie, PersonRole, RelatedMovie
+
+# A candidate's score is the sum, over every genre, person, language and platform it
+# shares with the movie, of that feature kind's weight times the feature's inverse
+# document frequency, so sharing "Drama" counts for far less than sharing a director.
+WEIGHTS = {'genre': 3.0, 'person': 2.0, 'language': 1.0, 'platform': 0.5}
+NEIGHBOURS = 20
+DEFAULT_LIMIT = 10
+# Features attached to more movies than this carry almost no signal and would make
+# scoring quadratic in the size of the catalog.
+MAX_POSTING = 5000
+
+
+def _feature_rows(movie_ids=None, feature_ids=None):
+    """(kind, movie_id, feature_id) rows, optionally restricted to some movies or features."""
+    sources = {
+        'genre': (Movie.genres.through.objects, 'genre_id'),
+        'language': (Movie.languages.through.objects, 'language_id'),
+        'platform': (Movie.streaming_platform.through.objects, 'platform_id'),
+        'person': (PersonRole.objects.filter(movie__isnull=False), 'person_id'),
+    }
+    for kind, (rows, column) in sources.items():
+        if movie_ids is not None:
+            rows = rows.filter(movie_id__in=movie_ids)
+        if feature_ids is not None:
+            if not feature_ids.get(kind):
+                continue
+            rows = rows.filter(**{f'{column}__in': feature_ids[kind]})
+        for movie_id, feature_id in rows.order_by().values_list('movie_id', column).distinct():
+            yield kind, movie_id, feature_id
+
+
+def _postings(rows):
+    postings = defaultdict(set)
+    for kind, movie_id, feature_id in rows:
+        postings[kind, feature_id].add(movie_id)
+    return postings
+
+
+def _score(movie_id, features, postings, total):
+    scores = defaultdict(float)
+    for feature in features:
+        movies = postings.get(feature, ())
+        if len(movies) < 2 or len(movies) > MAX_POSTING:
+            continue
+        weight = WEIGHTS[feature[0]] * math.log(1 + total / len(movies))
+        for other in movies:
+            if other != movie_id:
+                scores[other] += weight
+    return scores
+
+
+def _top(scores):
+    return heapq.nlargest(NEIGHBOURS, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def score_candidates(movie_id):
+    """Every movie sharing a feature with `movie_id`, mapped to its similarity score."""
+    features = defaultdict(set)
+    for kind, _, feature_id in _feature_rows(movie_ids=[movie_id]):
+        features[kind].add(feature_id)
+    if not features:
+        return {}
+    postings = _postings(_feature_rows(feature_ids=features))
+    own = [(kind, feature_id) for kind, ids in features.items() for feature_id in ids]
+    return _score(movie_id, own, postings, Movie.objects.count())
+
+
+def refresh(movie_id):
+    """Recompute one movie's neighbours and its score in every list that mentions it.
+
+    Similarity is symmetric, so the movie is also written into (or dropped from) the
+    lists of its new neighbours and of the movies that previously listed it; those
+    lists are then trimmed back to NEIGHBOURS. `manage.py rebuild_related` recomputes
+    all lists from scratch, e.g. after large catalog imports.
+    """
+    scores = score_candidates(movie_id)
+    top = _top(scores)
+    with transaction.atomic():
+        referrers = set(RelatedMovie.objects.filter(related_id=movie_id)
+                        .values_list('movie_id', flat=True))
+        RelatedMovie.objects.filter(Q(movie_id=movie_id) | Q(related_id=movie_id)).delete()
+
+        rows = [RelatedMovie(movie_id=movie_id, related_id=other, score=score) for other, score in top]
+        affected = referrers | {other for other, _ in top}
+        rows += [RelatedMovie(movie_id=other, related_id=movie_id, score=scores[other])
+                 for other in affected if scores.get(other)]
+        RelatedMovie.objects.bulk_create(rows)
+        _trim(affected)
+
+
+def _trim(movie_ids):
+    if not movie_ids:
+        return
+    ranked = (RelatedMovie.objects.filter(movie_id__in=movie_ids)
+              .annotate(rank=Window(RowNumber(), partition_by=F('movie_id'),
+                                    order_by=[F('score').desc(), F('related_id').asc()]))
+              .filter(rank__gt=NEIGHBOURS))
+    extra = list(ranked.values_list('pk', flat=True))
+    if extra:
+        RelatedMovie.objects.filter(pk__in=extra).delete()
+
+
+def rebuild():
+    """Recompute every movie's neighbours from scratch."""
+    features = defaultdict(list)
+    rows = list(_feature_rows())
+    for kind, movie_id, feature_id in rows:
+        features[movie_id].append((kind, feature_id))
+    postings = _postings(rows)
+    total = Movie.objects.count()
+
+    with transaction.atomic():
+        RelatedMovie.objects.all().delete()
+        RelatedMovie.objects.bulk_create(
+            (RelatedMovie(movie_id=movie_id, related_id=other, score=score)
+             for movie_id, own in features.items()
+             for other, score in _top(_score(movie_id, own, postings, total))),
+            batch_size=1000)
+    return len(features)
+
+
+def related_movies(movie, limit=DEFAULT_LIMIT):
+    return (Movie.objects.filter(neighbour_of__movie=movie)
+            .annotate(related_score=F('neighbour_of__score'))
+            .order_by('-related_score', 'id')
+            .prefetch_related('genres')[:limit])
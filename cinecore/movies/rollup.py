@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast, Now
+
+from movies.models import Episode, Review, ShowRating, WebSeason, WebShow
+
+# A show's score is the weighted mean of three averages: its own reviews, the reviews
+# of all its seasons and the reviews of all its episodes. Levels without reviews drop
+# out and the remaining weights are renormalised.
+WEIGHTS = {'show': 0.5, 'season': 0.3, 'episode': 0.2}
+LEVELS = {WebShow: 'show', WebSeason: 'season', Episode: 'episode'}
+
+
+def _average(level):
+    return Case(
+        When(**{f'{level}_count__gt': 0},
+             then=Cast(F(f'{level}_sum'), FloatField()) / F(f'{level}_count')),
+        default=0.0,
+        output_field=FloatField(),
+    )
+
+
+def _present(level):
+    return Case(When(**{f'{level}_count__gt': 0}, then=WEIGHTS[level]),
+                default=0.0, output_field=FloatField())
+
+
+def score_expression():
+    # Evaluated by the database so concurrent writers never read-modify-write the score.
+    total = sum(_average(level) * weight for level, weight in WEIGHTS.items())
+    weights = sum(_present(level) for level in WEIGHTS)
+    reviewed = Q(show_count__gt=0) | Q(season_count__gt=0) | Q(episode_count__gt=0)
+    return Case(When(reviewed, then=total / weights), default=0.0, output_field=FloatField())
+
+
+def compute_score(**totals):
+    weighted = [(WEIGHTS[level], totals[f'{level}_sum'] / totals[f'{level}_count'])
+                for level in WEIGHTS if totals.get(f'{level}_count')]
+    if not weighted:
+        return 0.0
+    return sum(weight * average for weight, average in weighted) / sum(w for w, _ in weighted)
+
+
+def levels():
+    """{content_type_id: level} for the titles that roll up into a show."""
+    return {content_type.id: LEVELS[model]
+            for model, content_type in ContentType.objects.get_for_models(*LEVELS).items()}
+
+
+def _show_id(level, object_id):
+    if level == 'show':
+        return object_id
+    if level == 'season':
+        row = WebSeason.objects.filter(pk=object_id).values_list('webshow_id', flat=True)
+    else:
+        row = Episode.objects.filter(pk=object_id).values_list('season__webshow_id', flat=True)
+    return row.first()
+
+
+def apply_review(level, object_id, rating, sign):
+    """Add (sign=1) or remove (sign=-1) one show, season or episode review from its show's rollup."""
+    show_id = _show_id(level, object_id)
+    if show_id is None:
+        return
+    changes = {
+        f'{level}_sum': F(f'{level}_sum') + sign * rating,
+        f'{level}_count': F(f'{level}_count') + sign,
+        'updated_at': Now(),
+    }
+    with transaction.atomic():
+        entry = ShowRating.objects.filter(webshow_id=show_id)
+        if not entry.update(**changes):
+            if sign < 0:
+                return
+            ShowRating.objects.get_or_create(webshow_id=show_id)
+            entry.update(**changes)
+        entry.update(score=score_expression())
+
+
+def summary(entry):
+    if entry is None:
+        entry = ShowRating()
+    data = {'score': round(entry.score, 2)}
+    for level in WEIGHTS:
+        count = getattr(entry, f'{level}_count')
+        average = getattr(entry, f'{level}_sum') / count if count else 0
+        data[f'{level}s'] = {'avg': round(average, 1), 'count': count, 'weight': WEIGHTS[level]}
+    return data
+
+
+def rebuild():
+    """Recompute every show's rollup from the review table."""
+    owners = {
+        'show': None,
+        'season': dict(WebSeason.objects.values_list('pk', 'webshow_id')),
+        'episode': dict(Episode.objects.values_list('pk', 'season__webshow_id')),
+    }
+    level_of = levels()
+    totals = defaultdict(lambda: defaultdict(int))
+    rows = (Review.objects.filter(content_type__in=level_of).order_by()
+            .values('content_type', 'object_id').annotate(total=Sum('rating'), count=Count('id')))
+    for row in rows:
+        level = level_of[row['content_type']]
+        show_id = row['object_id'] if owners[level] is None else owners[level].get(row['object_id'])
+        if show_id is not None:
+            totals[show_id][f'{level}_sum'] += row['total']
+            totals[show_id][f'{level}_count'] += row['count']
+
+    entries = [ShowRating(webshow_id=show_id, score=compute_score(**totals[show_id]), **totals[show_id])
+               for show_id in WebShow.objects.values_list('pk', flat=True).iterator()]
+    with transaction.atomic():
+        ShowRating.objects.all().delete()
+        ShowRating.objects.bulk_create(entries, batch_size=500)
+    return len(entries)
@@ -0,0 +1,227 @@
+import heapq
+import re
+import time
+import unicodedata
+from operator import itemgetter
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, Sum, When
+
+from movies.models import Movie, Person, SearchDocument, SearchToken, WebShow
+
+# SQLite builds ship FTS5, which gives bm25 ranking and prefix queries over a real
+# inverted index. Other backends (or SQLite without FTS5) fall back to the SearchToken
+# postings table, queried with indexed `token LIKE 'prefix%'` lookups.
+FTS_TABLE = 'movies_search_fts'
+TITLE_WEIGHT = 10
+BODY_WEIGHT = 1
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TOKENS = 8
+# How long a process trusts its FTS table check, so a migrate run while the server is
+# up (creating or dropping the table) takes effect without a restart.
+FTS_RECHECK_SECONDS = 60
+_fts_available = {}
+
+
+def tokenize(text):
+    """Lowercased, accent-stripped word tokens; matches FTS5's unicode61 tokenizer."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [token[:MAX_TOKEN_LENGTH] for token in re.findall(r'\w+', text)]
+
+
+def has_fts_table():
+    return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+
+def uses_fts():
+    key = connection.settings_dict['NAME']
+    available, checked_at = _fts_available.get(key, (None, 0))
+    now = time.monotonic()
+    if available is None or now - checked_at > FTS_RECHECK_SECONDS:
+        available = has_fts_table()
+        _fts_available[key] = (available, now)
+    return available
+
+
+def forget_fts():
+    _fts_available.pop(connection.settings_dict['NAME'], None)
+
+
+def _join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def movie_document(movie):
+    people = [role.person.name for role in movie.movie_role.all()]
+    platforms = [platform.name for platform in movie.streaming_platform.all()]
+    return movie.title, _join(movie.short_synopsis, movie.full_synopsis, *platforms, *people)
+
+
+def webshow_document(show):
+    people = [role.person.name for role in show.webshow_role.all()]
+    people += [person.name for person in show.creator.all()]
+    platforms = [platform.name for platform in show.streaming_platform.all()]
+    return show.title, _join(show.short_synopsis, show.full_synopsis, *platforms, *people)
+
+
+def person_document(person):
+    return person.name, person.bio or ''
+
+
+# kind -> (model, document builder, prefetches used by rebuild)
+KINDS = {
+    SearchDocument.MOVIE: (Movie, movie_document, ('movie_role__person', 'streaming_platform')),
+    SearchDocument.WEBSHOW: (WebShow, webshow_document,
+                             ('webshow_role__person', 'creator', 'streaming_platform')),
+    SearchDocument.PERSON: (Person, person_document, ()),
+}
+MODEL_KINDS = {model: kind for kind, (model, _, _) in KINDS.items()}
+
+
+def postings(title, body):
+    weights = {}
+    for token in tokenize(body):
+        weights[token] = BODY_WEIGHT
+    for token in tokenize(title):
+        weights[token] = TITLE_WEIGHT
+    return weights
+
+
+def _fts_write(cursor, document_id, title, body):
+    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [document_id])
+    cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                   [document_id, title, body])
+
+
+def index_object(obj):
+    """Bring one movie, webshow or person's search document up to date.
+
+    Returns False when the stored document already matched.
+    """
+    kind = MODEL_KINDS[type(obj)]
+    title, body = KINDS[kind][1](obj)
+    document = SearchDocument.objects.filter(kind=kind, object_id=obj.pk).first()
+    if document and document.title == title and document.body == body:
+        return False
+
+    with transaction.atomic():
+        if document is None:
+            document = SearchDocument.objects.create(kind=kind, object_id=obj.pk, title=title, body=body)
+        else:
+            document.title, document.body = title, body
+            document.save(update_fields=['title', 'body'])
+
+        if uses_fts():
+            with connection.cursor() as cursor:
+                _fts_write(cursor, document.pk, title, body)
+        else:
+            document.tokens.all().delete()
+            SearchToken.objects.bulk_create(
+                SearchToken(document=document, token=token, weight=weight)
+                for token, weight in postings(title, body).items())
+    return True
+
+
+def remove_object(model, object_id):
+    document = SearchDocument.objects.filter(kind=MODEL_KINDS[model], object_id=object_id).first()
+    if document is None:
+        return
+    with transaction.atomic():
+        if uses_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [document.pk])
+        document.delete()
+
+
+def rebuild():
+    """Re-index everything, e.g. after switching between FTS5 and the token table."""
+    fts = uses_fts()
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        if fts:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        count = 0
+        for kind, (model, build, prefetch) in KINDS.items():
+            objects = model.objects.prefetch_related(*prefetch)
+            documents = [SearchDocument(kind=kind, object_id=obj.pk, title=title, body=body)
+                         for obj in objects.iterator(chunk_size=500)
+                         for title, body in [build(obj)]]
+            documents = SearchDocument.objects.bulk_create(documents, batch_size=500)
+            if documents and documents[0].pk is None:  # Backends without RETURNING.
+                documents = list(SearchDocument.objects.filter(kind=kind))
+            count += len(documents)
+
+            if fts:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                        [(document.pk, document.title, document.body) for document in documents])
+            else:
+                SearchToken.objects.bulk_create(
+                    (SearchToken(document_id=document.pk, token=token, weight=weight)
+                     for document in documents
+                     for token, weight in postings(document.title, document.body).items()),
+                    batch_size=1000)
+    return count
+
+
+def _fts_search(tokens, kinds, limit):
+    documents = SearchDocument._meta.db_table
+    sql = (f"SELECT d.kind, d.object_id, d.title, -bm25({FTS_TABLE}, %s, %s) AS score "
+           f"FROM {FTS_TABLE} JOIN {documents} d ON d.id = {FTS_TABLE}.rowid "
+           f"WHERE {FTS_TABLE} MATCH %s")
+    # Each token matches as a prefix; listing the exact form too ranks whole words first.
+    match = ' AND '.join(f'("{token}" OR "{token}"*)' for token in tokens)
+    params = [TITLE_WEIGHT, BODY_WEIGHT, match]
+    if kinds:
+        sql += f" AND d.kind IN ({', '.join(['%s'] * len(kinds))})"
+        params += kinds
+    sql += " ORDER BY score DESC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _token_search(tokens, kinds, limit):
+    scores = None
+    for token in tokens:
+        matches = SearchToken.objects.filter(token__startswith=token)
+        if kinds:
+            matches = matches.filter(document__kind__in=kinds)
+        exact = Case(When(token=token, then=F('weight')), default=0)
+        matched = dict(matches.order_by().values('document')
+                       .annotate(score=Sum('weight') + Sum(exact)).values_list('document', 'score'))
+        if scores is not None:
+            matched = {document: score + scores[document]
+                       for document, score in matched.items() if document in scores}
+        scores = matched
+        if not scores:
+            return []
+
+    top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+    documents = SearchDocument.objects.in_bulk([document for document, _ in top])
+    return [(documents[pk].kind, documents[pk].object_id, documents[pk].title, score)
+            for pk, score in top]
+
+
+def search(query, kinds=None, limit=20):
+    """Ranked [{'type', 'id', 'title', 'score'}] for every query token matched as a prefix."""
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+    kinds = list(kinds or [])
+    if uses_fts():
+        try:
+            rows = _fts_search(tokens, kinds, limit)
+        except OperationalError:
+            # The table went away since the last check; look again next time.
+            forget_fts()
+            rows = _token_search(tokens, kinds, limit)
+    else:
+        rows = _token_search(tokens, kinds, limit)
+    return [{'type': kind, 'id': object_id, 'title': title, 'score': round(score, 3)}
+            for kind, object_id, title, score in rows]
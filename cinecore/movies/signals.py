@@ -0,0 +1,237 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from movies import (activity, autocomplete, leaderboard, ratings, related, rollup, search,
+                    versions)
+from movies.models import (Episode, Movie, Person, PersonRole, Platform, Review, ReviewLike,
+                           ShowRating, TrendingMovie, WebSeason, WebShow)
+
+
+def _review_state(content_type_id, object_id, rating, is_critic, timestamp):
+    return {
+        'content_type_id': content_type_id,
+        'object_id': int(object_id),
+        'rating': int(rating),
+        'is_critic': is_critic,
+        'day': timezone.localdate(timestamp) if timezone.is_aware(timestamp) else timestamp.date(),
+    }
+
+
+def _current_state(review):
+    return _review_state(review.content_type_id, review.object_id, review.rating,
+                         review.is_critic, review.timestamp)
+
+
+def _stored_state(review):
+    """The review as the database has it, which a stale instance may not."""
+    stored = Review.objects.filter(pk=review.pk).values(
+        'content_type_id', 'object_id', 'rating', 'is_critic', 'timestamp').first()
+    return _review_state(**stored) if stored else None
+
+
+def _apply(state, sign):
+    ratings.apply_review(state['content_type_id'], state['object_id'], state['rating'],
+                         state['is_critic'], sign)
+    activity.apply_review(state['content_type_id'], state['object_id'], state['day'],
+                         state['rating'], sign)
+    if state['content_type_id'] == ContentType.objects.get_for_model(Movie).id:
+        leaderboard.apply_review(state['object_id'], state['rating'], state['is_critic'], sign)
+    level = rollup.levels().get(state['content_type_id'])
+    if level:
+        rollup.apply_review(level, state['object_id'], state['rating'], sign)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = _stored_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    current = _current_state(instance)
+    if previous == current:
+        ratings.touch(instance.content_type_id, instance.object_id)
+        return
+    with transaction.atomic():
+        if previous:
+            _apply(previous, -1)
+        _apply(current, 1)
+
+
+@receiver(pre_delete, sender=Review)
+def remember_deleted_review_state(sender, instance, **kwargs):
+    instance._stored_state = _stored_state(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    stored = getattr(instance, '_stored_state', None)
+    if stored:
+        with transaction.atomic():
+            _apply(stored, -1)
+
+
+def _touch_liked_review(review_id):
+    target = Review.objects.filter(pk=review_id).values_list('content_type_id', 'object_id').first()
+    if target:
+        ratings.touch(*target)
+
+
+@receiver(post_save, sender=ReviewLike)
+def review_liked(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Review.objects.filter(pk=instance.review_id).update(like_count=F('like_count') + 1)
+        _touch_liked_review(instance.review_id)
+
+
+@receiver(post_delete, sender=ReviewLike)
+def review_unliked(sender, instance, **kwargs):
+    Review.objects.filter(pk=instance.review_id).update(like_count=F('like_count') - 1)
+    _touch_liked_review(instance.review_id)
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TrendingMovie.objects.get_or_create(movie=instance)
+
+
+@receiver(post_save, sender=WebShow)
+def webshow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ShowRating.objects.get_or_create(webshow=instance)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=WebShow)
+@receiver(post_save, sender=Person)
+def searchable_saved(sender, instance, raw=False, **kwargs):
+    if raw or not search.index_object(instance):
+        return
+    autocomplete.invalidate()
+    if sender is Person:
+        # Credits embed the person's name in movie and webshow documents.
+        for role in instance.person_role.select_related('movie', 'webshow'):
+            search.index_object(role.movie or role.webshow)
+        for show in instance.created_shows.all():
+            search.index_object(show)
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=WebShow)
+@receiver(post_delete, sender=Person)
+def searchable_deleted(sender, instance, **kwargs):
+    search.remove_object(sender, instance.pk)
+    autocomplete.invalidate()
+
+
+@receiver(m2m_changed, sender=Movie.streaming_platform.through)
+@receiver(m2m_changed, sender=WebShow.streaming_platform.through)
+@receiver(m2m_changed, sender=WebShow.creator.through)
+def searchable_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_object(instance)
+    elif pk_set:
+        for obj in model.objects.filter(pk__in=pk_set):
+            search.index_object(obj)
+
+
+@receiver(post_save, sender=Platform)
+def platform_saved(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    for obj in [*instance.movie_set.all(), *instance.webshow_set.all()]:
+        search.index_object(obj)
+
+
+def _refresh_related(movie_id):
+    transaction.on_commit(lambda: related.refresh(movie_id))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.languages.through)
+@receiver(m2m_changed, sender=Movie.streaming_platform.through)
+def movie_features_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _refresh_related(instance.pk)
+    elif pk_set:
+        for movie_id in pk_set:
+            _refresh_related(movie_id)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def catalog_changed(sender, **kwargs):
+    if sender in versions.TRACKED:
+        versions.bump(sender)
+
+
+@receiver(m2m_changed)
+def catalog_relation_changed(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        versions.bump(*{type(instance), model} & versions.TRACKED)
+
+
+# Detail validators read Movie/WebShow.updated_at, which auto_now only moves on save();
+# relation and credit changes touch it explicitly.
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.languages.through)
+@receiver(m2m_changed, sender=Movie.subtitles.through)
+@receiver(m2m_changed, sender=Movie.streaming_platform.through)
+@receiver(m2m_changed, sender=WebShow.genres.through)
+@receiver(m2m_changed, sender=WebShow.languages.through)
+@receiver(m2m_changed, sender=WebShow.subtitles.through)
+@receiver(m2m_changed, sender=WebShow.streaming_platform.through)
+@receiver(m2m_changed, sender=WebShow.creator.through)
+def title_relations_touched(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=Now())
+    elif pk_set:
+        model.objects.filter(pk__in=pk_set).update(updated_at=Now())
+
+
+@receiver(post_save, sender=PersonRole)
+@receiver(post_delete, sender=PersonRole)
+def credit_changed(sender, instance, raw=False, **kwargs):
+    """A credit feeds its title's search document, detail validators and related movies."""
+    if raw:
+        return
+    for model, pk in ((Movie, instance.movie_id), (WebShow, instance.webshow_id)):
+        if pk is None:
+            continue
+        model.objects.filter(pk=pk).update(updated_at=Now())
+        target = model.objects.filter(pk=pk).first()
+        if target is not None:
+            search.index_object(target)
+        if model is Movie:
+            _refresh_related(pk)
+
+
+@receiver(post_save, sender=WebSeason)
+@receiver(post_delete, sender=WebSeason)
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def show_tree_touched(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender is WebSeason:
+        shows = WebShow.objects.filter(pk=instance.webshow_id)
+    else:
+        shows = WebShow.objects.filter(seasons=instance.season_id)
+    shows.update(updated_at=Now())
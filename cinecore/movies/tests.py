@@ -1,3 +1,1086 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import date, datetime, timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from movies import (activity, autocomplete, bundle, leaderboard, polls, ratings, recommendations, related,
+                    search)
+from movies.api.pagination import ReviewPagination
+from movies.api.serializer import embedded_review_limit
+from movies.models import (Award, Episode, FanTheory, FanTheoryVote, Genre, ItemSimilarity, Language,
+                           Movie, MovieRole, MovieTrivia, Person, PersonRole, Platform, Poll, PollOption,
+                           PollVote, RatingAggregate, Review, ReviewDailyBucket, ReviewLike, TrendingMovie,
+                           WebSeason, WebShow)
+
+
+class ReviewIndexTests(TestCase):
+    """The generic (content_type, object_id) review lookups must be served by an index."""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Query plan assertions are written against SQLite's EXPLAIN output.")
+        self.movie_ct = ContentType.objects.get_for_model(Movie)
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('SCAN movies_review', plan)
+
+    def test_recent_reviews_use_target_timestamp_index(self):
+        qs = Review.objects.filter(content_type=self.movie_ct, object_id=1).order_by('-timestamp', '-id')
+        self.assertUsesIndex(qs, 'review_target_recent_idx')
+        self.assertNotIn('TEMP B-TREE', qs.explain())
+
+    def test_popular_reviews_use_target_like_count_index(self):
+        qs = (Review.objects.filter(content_type=self.movie_ct, object_id=1)
+              .order_by('-like_count', '-timestamp', '-id'))
+        self.assertUsesIndex(qs, 'review_target_popular_idx')
+        self.assertNotIn('TEMP B-TREE', qs.explain())
+        self.assertNotIn('movies_reviewlike', qs.explain())
+
+    def test_heatmap_range_reads_daily_bucket_index(self):
+        qs = activity.series(self.movie_ct, 1, start=date(2024, 1, 1), end=date(2024, 12, 31))
+        plan = qs.explain()
+        self.assertIn('SEARCH movies_reviewdailybucket USING INDEX', plan)
+        self.assertNotIn('SCAN', plan)
+        self.assertNotIn('movies_review ', plan)
+
+    def test_rating_summary_is_covered_by_rating_index(self):
+        qs = (Review.objects.filter(content_type=self.movie_ct, object_id=1)
+              .values('content_type').annotate(**ratings.review_aggregates()))
+        self.assertUsesIndex(qs, 'COVERING INDEX review_target_rating_idx')
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+        self.movie_ct = ContentType.objects.get_for_model(Movie)
+        self.user = User.objects.create(username='critic')
+
+    def review(self, rating, **fields):
+        return Review.objects.create(review_user=fields.pop('review_user', self.user),
+                                     content_object=self.movie, review_text='-', rating=rating, **fields)
+
+    def test_deleting_a_stale_instance_removes_the_stored_review(self):
+        stale = self.review(2)
+        fresh = Review.objects.get(pk=stale.pk)
+        fresh.rating = 5
+        fresh.save()
+        stale.delete()
+
+        self.assertEqual(ratings.get_summary(self.movie_ct, self.movie.pk),
+                         ratings.compute_summary(self.movie_ct, self.movie.pk))
+        self.assertEqual(ratings.get_summary(self.movie_ct, self.movie.pk)['audience']['count'], 0)
+        entry = TrendingMovie.objects.get(movie=self.movie)
+        self.assertEqual((entry.audience_sum, entry.audience_count, entry.score), (0, 0, 0))
+        self.assertEqual(list(activity.series(self.movie_ct, self.movie.pk)), [])
+
+    def test_rating_edit_moves_the_review_between_audience_and_critic(self):
+        review = self.review(2)
+        self.review(4, review_user=User.objects.create(username='pro'), is_critic=True)
+        review.rating, review.is_critic = 5, True
+        review.save()
+
+        summary = ratings.get_summary(self.movie_ct, self.movie.pk)
+        self.assertEqual(summary, ratings.compute_summary(self.movie_ct, self.movie.pk))
+        self.assertEqual(summary['critic'], {'avg': 4.5, 'count': 2})
+        self.assertEqual(summary['audience'], {'avg': 0, 'count': 0})
+        self.assertEqual(summary['distribution'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+
+    def test_reconcile_repairs_drifted_and_missing_aggregates(self):
+        self.review(3)
+        other = Movie.objects.create(title='Ronin', short_synopsis='s', full_synopsis='f',
+                                     release_date=date(1998, 9, 25), runtime=122)
+        Review.objects.create(review_user=self.user, content_object=other, review_text='-', rating=5)
+        RatingAggregate.objects.filter(object_id=self.movie.pk).update(audience_count=9, rating_1=4)
+        RatingAggregate.objects.filter(object_id=other.pk).delete()
+
+        out = io.StringIO()
+        call_command('reconcile_ratings', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted and 1 missing', out.getvalue())
+        self.assertEqual(RatingAggregate.objects.get(object_id=self.movie.pk).audience_count, 9)
+
+        call_command('reconcile_ratings', stdout=io.StringIO())
+        for movie in (self.movie, other):
+            self.assertEqual(ratings.get_summary(self.movie_ct, movie.pk),
+                             ratings.compute_summary(self.movie_ct, movie.pk))
+        self.assertEqual(ratings.reconcile(), {'drifted': 0, 'missing': 0})
+
+
+class RatingSummaryRouteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+        # Same ids across types, so a lookup that ignores the content type would mix them up.
+        self.show = WebShow.objects.create(pk=self.movie.pk, title='Heat: The Series',
+                                           short_synopsis='s', full_synopsis='f', seasons_count=1)
+        self.season = WebSeason.objects.create(pk=self.movie.pk, webshow=self.show, season_number=1,
+                                               total_episodes=1, release_date=date(2020, 1, 1))
+        self.episode = Episode.objects.create(pk=self.movie.pk, season=self.season, episode_number=1,
+                                              title='Pilot', description='d',
+                                              release_date=date(2020, 1, 1), runtime=50)
+
+    def test_each_type_has_its_own_summary(self):
+        routes = {
+            self.movie: f'/api/movies/{self.movie.pk}/reviews/summary/',
+            self.show: f'/api/webshow/{self.show.pk}/review/summary/',
+            self.season: f'/api/season/{self.season.pk}/review/summary/',
+            self.episode: f'/api/episode/{self.episode.pk}/review/summary/',
+        }
+        for stars, title in enumerate(routes, start=2):
+            Review.objects.create(review_user=User.objects.create(username=f'u{stars}'),
+                                  content_object=title, review_text='-', rating=stars)
+        for stars, (title, url) in enumerate(routes.items(), start=2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.data['audience'], {'avg': stars, 'count': 1}, url)
+            self.assertEqual(response.data['distribution'][str(stars)], 1, url)
+
+    def test_unknown_titles_are_not_found(self):
+        missing = self.movie.pk + 100
+        for url in (f'/api/movies/{missing}/reviews/summary/', '/api/movies/abc/reviews/summary/',
+                    f'/api/webshow/{missing}/review/summary/', f'/api/season/{missing}/review/summary/',
+                    f'/api/episode/{missing}/review/summary/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.movies = [Movie.objects.create(title=f'Movie {n}', short_synopsis='s', full_synopsis='f',
+                                            release_date=date(2000, 1, 1), runtime=100)
+                       for n in range(10)]
+        self.users = 0
+
+    def review(self, movie, rating, is_critic=False):
+        self.users += 1
+        user = User.objects.create(username=f'reviewer{self.users}')
+        return Review.objects.create(review_user=user, content_object=movie, review_text='-',
+                                     rating=rating, is_critic=is_critic)
+
+    def entry(self, movie):
+        return TrendingMovie.objects.values('critic_sum', 'critic_count', 'audience_sum',
+                                            'audience_count', 'score').get(movie=movie)
+
+    def test_score_follows_review_create_edit_and_delete(self):
+        movie = self.movies[0]
+        critic = self.review(movie, 4, is_critic=True)
+        audience = self.review(movie, 2)
+        self.assertAlmostEqual(self.entry(movie)['score'], 4 * 0.6 + 2 * 0.4)
+
+        audience.rating = 5
+        audience.save()
+        self.assertAlmostEqual(self.entry(movie)['score'], 4 * 0.6 + 5 * 0.4)
+
+        critic.is_critic = False
+        critic.save()
+        self.assertEqual(self.entry(movie), {'critic_sum': 0, 'critic_count': 0, 'audience_sum': 9,
+                                             'audience_count': 2, 'score': 4.5 * 0.4})
+
+        audience.delete()
+        critic.delete()
+        self.assertEqual(self.entry(movie), {'critic_sum': 0, 'critic_count': 0, 'audience_sum': 0,
+                                             'audience_count': 0, 'score': 0})
+
+    def test_top_movies_orders_by_score_then_id_and_is_limited(self):
+        stars = {movie.pk: 1 + n % 5 for n, movie in enumerate(self.movies)}
+        for movie in self.movies:
+            self.review(movie, stars[movie.pk])
+        expected = sorted(self.movies, key=lambda movie: (-stars[movie.pk], movie.pk))
+
+        top = leaderboard.top_movies()
+        self.assertEqual(len(top), leaderboard.TRENDING_SIZE)
+        self.assertEqual(top, expected[:leaderboard.TRENDING_SIZE])
+        self.assertEqual(leaderboard.top_movies(limit=3), expected[:3])
+        self.assertEqual(top[0].trending_score, 2.0)
+
+        response = APIClient().get('/api/movies/trending/')
+        self.assertEqual([row['id'] for row in response.data], [movie.pk for movie in top])
+
+    def test_rebuild_matches_the_incremental_state(self):
+        for n, movie in enumerate(self.movies[:6]):
+            self.review(movie, 1 + n % 5, is_critic=n % 2 == 0)
+            edited = self.review(movie, 3)
+            edited.rating, edited.is_critic = 5, True
+            edited.save()
+        self.review(self.movies[6], 4).delete()
+        incremental = {movie.pk: self.entry(movie) for movie in self.movies
+                       if TrendingMovie.objects.filter(movie=movie).exists()}
+
+        self.assertEqual(leaderboard.rebuild(), len(self.movies))
+        for movie_id, entry in incremental.items():
+            self.assertEqual(self.entry(movie_id), entry)
+        for movie in self.movies[7:]:
+            self.assertEqual(self.entry(movie)['score'], 0)
+
+
+class HeatmapTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+        self.url = f'/api/movies/{self.movie.pk}/reviews/heatmap/'
+        self.reviews = [self.review(self.movie, day, rating)
+                        for day, rating in ((date(2024, 1, 1), 4), (date(2024, 1, 3), 2),
+                                            (date(2024, 1, 10), 5), (date(2024, 2, 5), 3))]
+
+    def review(self, title, day, rating):
+        user = User.objects.create(username=f'fan{User.objects.count()}')
+        written = datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=written):
+            return Review.objects.create(review_user=user, content_object=title, review_text='-',
+                                         rating=rating)
+
+    def heatmap(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [(row['date'], row['count'], row['rating_sum']) for row in response.json()]
+
+    def test_granularities(self):
+        self.assertEqual(self.heatmap(), [('2024-01-01', 1, 4), ('2024-01-03', 1, 2),
+                                          ('2024-01-10', 1, 5), ('2024-02-05', 1, 3)])
+        self.assertEqual(self.heatmap(granularity='week'),
+                         [('2024-01-01', 2, 6), ('2024-01-08', 1, 5), ('2024-02-05', 1, 3)])
+        self.assertEqual(self.heatmap(granularity='month'), [('2024-01-01', 3, 11), ('2024-02-01', 1, 3)])
+
+    def test_from_and_to_bound_the_days(self):
+        self.assertEqual(self.heatmap(**{'from': '2024-01-02', 'to': '2024-01-10'}),
+                         [('2024-01-03', 1, 2), ('2024-01-10', 1, 5)])
+        self.assertEqual(self.heatmap(**{'from': '2024-01-02', 'granularity': 'month'}),
+                         [('2024-01-01', 2, 7), ('2024-02-01', 1, 3)])
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'from': '2024-13-01'}, {'to': 'yesterday'}, {'granularity': 'year'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_buckets_follow_edits_and_deletes(self):
+        self.reviews[1].rating = 1
+        self.reviews[1].save()
+        self.reviews[2].delete()
+        self.assertEqual(self.heatmap(), [('2024-01-01', 1, 4), ('2024-01-03', 1, 1), ('2024-02-05', 1, 3)])
+        self.assertEqual(self.heatmap(granularity='week'), [('2024-01-01', 2, 5), ('2024-02-05', 1, 3)])
+
+    def test_deleting_a_title_removes_its_buckets(self):
+        show = WebShow.objects.create(title='Heat: The Series', short_synopsis='s', full_synopsis='f',
+                                      seasons_count=1)
+        season = WebSeason.objects.create(webshow=show, season_number=1, total_episodes=1,
+                                          release_date=date(2020, 1, 1))
+        episode = Episode.objects.create(season=season, episode_number=1, title='Pilot', description='d',
+                                         release_date=date(2020, 1, 1), runtime=50)
+        for title in (show, season, episode):
+            self.review(title, date(2024, 3, 1), 4)
+
+        self.movie.delete()
+        show.delete()
+        self.assertFalse(ReviewDailyBucket.objects.exists())
+
+
+class ReviewLikeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+        self.users = [User.objects.create(username=f'fan{n}') for n in range(4)]
+        self.reviews = [Review.objects.create(review_user=user, content_object=self.movie,
+                                              review_text='-', rating=4)
+                        for user in self.users[:3]]
+
+    def like(self, method, review, user):
+        self.client.force_authenticate(user)
+        url = f'/api/movies/{self.movie.pk}/reviews/{review.pk}/like/'
+        return getattr(self.client, method)(url)
+
+    def assertLikeCountsInSync(self):
+        for review in Review.objects.all():
+            self.assertEqual(review.like_count, ReviewLike.objects.filter(review=review).count())
+
+    def test_post_and_put_are_idempotent(self):
+        review, user = self.reviews[0], self.users[1]
+        for method in ('post', 'post', 'put', 'put', 'post'):
+            response = self.like(method, review, user)
+            self.assertIn(response.status_code, (200, 201), method)
+            self.assertEqual(response.data['likes_count'], 1, method)
+        self.assertEqual(ReviewLike.objects.filter(review=review, like_user=user).count(), 1)
+        self.assertLikeCountsInSync()
+
+    def test_deleting_a_missing_like_is_a_no_op(self):
+        review = self.reviews[0]
+        self.like('put', review, self.users[2])
+        for _ in range(2):
+            response = self.like('delete', review, self.users[1])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['likes_count'], 1)
+        self.like('delete', review, self.users[2])
+        self.assertEqual(self.like('delete', review, self.users[2]).data['likes_count'], 0)
+        self.assertLikeCountsInSync()
+
+    def test_like_count_and_popular_order_follow_likes(self):
+        first, second, third = self.reviews
+        for user in self.users:
+            self.like('put', second, user)
+        for user in self.users[:2]:
+            self.like('post', third, user)
+        self.like('delete', second, self.users[3])
+        self.assertLikeCountsInSync()
+
+        response = self.client.get(f'/api/movies/{self.movie.pk}/reviews/popular/',
+                                   {'movie_id': self.movie.pk})
+        self.assertEqual([(row['id'], row['likes_count']) for row in response.data['results']],
+                         [(second.pk, 3), (third.pk, 2), (first.pk, 0)])
+
+
+class MovieDetailQueryTests(TestCase):
+    """The movie detail payload is built from a fixed number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Query Count', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(2020, 1, 1), runtime=120)
+        self.movie.genres.add(Genre.objects.create(name='Drama'))
+        self.movie.subtitles.add(Language.objects.create(name='english'))
+        self.people = 0
+
+    def add_cast_and_reviews(self, count):
+        for _ in range(count):
+            self.people += 1
+            person = Person.objects.create(name=f'Person {self.people}')
+            PersonRole.objects.create(person=person, movie=self.movie, role=MovieRole.ACTOR)
+            PersonRole.objects.create(person=person, movie=self.movie, role=MovieRole.DIRECTOR)
+            user = User.objects.create(username=f'user{self.people}')
+            review = Review.objects.create(review_user=user, content_object=self.movie,
+                                           review_text='Great', rating=4)
+            ReviewLike.objects.create(like_user=user, review=review)
+
+    def get_detail(self):
+        return self.client.get(f'/api/movies/{self.movie.pk}/')
+
+    def test_query_count_does_not_grow_with_cast_or_reviews(self):
+        self.add_cast_and_reviews(1)
+        with CaptureQueriesContext(connection) as baseline:
+            response = self.get_detail()
+        self.assertEqual(len(response.data['cast']), 1)
+
+        self.add_cast_and_reviews(5)
+        with self.assertNumQueries(len(baseline.captured_queries)):
+            response = self.get_detail()
+        self.assertEqual(len(response.data['cast']), 6)
+        self.assertEqual(len(response.data['directors']), 6)
+        self.assertEqual(response.data['reviews'][0]['likes_count'], 1)
+        self.assertEqual(response.data['reviews'][0]['movie_title'], 'Query Count')
+
+    def review_ids(self, **params):
+        response = self.client.get(f'/api/movies/{self.movie.pk}/', params)
+        return [review['id'] for review in response.data['reviews']], response.data['reviews_next']
+
+    @override_settings(DETAIL_REVIEWS_LIMIT=3)
+    def test_embeds_the_newest_reviews_and_links_to_the_rest(self):
+        self.add_cast_and_reviews(3)
+        newest = list(Review.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(self.review_ids(), (newest, None))
+
+        self.add_cast_and_reviews(2)
+        newest = list(Review.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        ids, next_url = self.review_ids()
+        self.assertEqual(ids, newest[:3])
+        self.assertTrue(next_url.endswith(f'/api/movies/{self.movie.pk}/reviews/?page=2&page_size=3'))
+        page = self.client.get(next_url).data
+        self.assertEqual(page['count'], 5)
+        self.assertEqual([review['id'] for review in page['results']], newest[3:])
+
+    @override_settings(DETAIL_REVIEWS_LIMIT=3)
+    def test_reviews_all_and_reviews_limit(self):
+        self.add_cast_and_reviews(6)
+        newest = list(Review.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(self.review_ids(reviews='all'), (newest, None))
+
+        ids, next_url = self.review_ids(reviews_limit=2)
+        self.assertEqual(ids, newest[:2])
+        self.assertIn('page_size=2', next_url)
+        self.assertEqual(self.review_ids(reviews_limit=0)[0], newest[:1])
+        self.assertEqual(self.review_ids(reviews_limit='many')[0], newest[:3])
+        self.assertEqual(self.review_ids(reviews_limit=1000), (newest, None))
+
+        request = Request(APIRequestFactory().get('/', {'reviews_limit': 1000}))
+        self.assertEqual(embedded_review_limit(request), ReviewPagination.max_page_size)
+
+
+class FanTheoryUpvoteConcurrencyTests(TransactionTestCase):
+    """Parallel upvotes must neither lose increments nor exceed the per-user cap."""
+
+    users = 4
+    clicks_per_user = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite':
+            self.use_immediate_sqlite_connections()
+        owner = User.objects.create(username='owner')
+        movie = Movie.objects.create(title='Stress', short_synopsis='s', full_synopsis='f',
+                                     release_date=date(2020, 1, 1), runtime=120)
+        self.theory = FanTheory.objects.create(movie=movie, user=owner, theory='It was a dream')
+        self.voters = [User.objects.create(username=f'voter{i}') for i in range(self.users)]
+        self.url = f'/api/movies/{movie.pk}/fantheories/{self.theory.pk}/upvote/'
+
+    def use_immediate_sqlite_connections(self):
+        """Point this test, and the worker threads it starts, at a file copy of the test database.
+
+        Worker threads open their own connections from `connections.settings`. Deferred
+        SQLite transactions that read and then write fail with "database is locked" rather
+        than wait, so only these connections take the write lock up front. The default
+        in-memory test database is shared-cache, which raises table-lock errors instead of
+        waiting at all, so the threads get a file-backed copy of it.
+        """
+        original = connections[DEFAULT_DB_ALIAS]
+        settings_dict = {**original.settings_dict,
+                         'OPTIONS': {**original.settings_dict['OPTIONS'],
+                                     'transaction_mode': 'IMMEDIATE', 'timeout': 20}}
+        if original.is_in_memory_db():
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            settings_dict['NAME'] = os.path.join(directory.name, 'stress.sqlite3')
+            original.ensure_connection()
+            with closing(sqlite3.connect(settings_dict['NAME'])) as target:
+                original.connection.backup(target)
+
+        patcher = mock.patch.dict(connections.settings, {DEFAULT_DB_ALIAS: settings_dict})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stress = connections.create_connection(DEFAULT_DB_ALIAS)
+        connections[DEFAULT_DB_ALIAS] = stress
+        self.addCleanup(connections.__setitem__, DEFAULT_DB_ALIAS, original)
+        self.addCleanup(stress.close)
+
+    def upvote(self, user, barrier):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            return client.post(self.url).status_code
+        finally:
+            connection.close()
+
+    def test_parallel_upvotes_are_counted_exactly(self):
+        jobs = [user for user in self.voters for _ in range(self.clicks_per_user)]
+        barrier = threading.Barrier(len(jobs))
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            statuses = list(pool.map(lambda user: self.upvote(user, barrier), jobs))
+
+        max_points = FanTheoryVote.MAX_POINTS
+        self.assertEqual(statuses.count(200), self.users * max_points)
+        self.assertEqual(statuses.count(400), self.users * (self.clicks_per_user - max_points))
+        self.theory.refresh_from_db()
+        self.assertEqual(self.theory.upvotes, self.users * max_points)
+        self.assertEqual(
+            sorted(FanTheoryVote.objects.values_list('points', flat=True)),
+            [max_points] * self.users,
+        )
+
+
+class PollVoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        movie = Movie.objects.create(title='Premiere', short_synopsis='s', full_synopsis='f',
+                                     release_date=date(2020, 1, 1), runtime=120)
+        self.poll = Poll.objects.create(movie=movie, question='Best scene?')
+        self.option = PollOption.objects.create(poll=self.poll, option_text='Opening')
+        self.url = f'/api/movies/{movie.pk}/polls/{self.poll.pk}/vote/'
+        self.client = APIClient()
+
+    def vote(self, username, option=None):
+        user, _ = User.objects.get_or_create(username=username)
+        self.client.force_authenticate(user)
+        return self.client.post(self.url, {'option_id': (option or self.option).pk})
+
+    def test_vote_increments_once_per_user(self):
+        self.assertEqual(self.vote('a').data['votes'], 1)
+        self.assertEqual(self.vote('b').data['votes'], 2)
+        self.assertEqual(self.vote('a').status_code, 400)
+        self.option.refresh_from_db()
+        self.assertEqual(self.option.votes, 2)
+        self.assertEqual(PollVote.objects.count(), 2)
+
+    def test_option_from_another_poll_is_rejected(self):
+        other = Poll.objects.create(movie=self.poll.movie, question='Worst scene?')
+        stranger = PollOption.objects.create(poll=other, option_text='Ending')
+        self.assertEqual(self.vote('a', stranger).status_code, 404)
+
+    @override_settings(POLL_VOTES_BUFFERED=True, POLL_VOTES_FLUSH_INTERVAL=60)
+    def test_buffered_votes_are_flushed_in_bulk(self):
+        second = PollOption.objects.create(poll=self.poll, option_text='Finale')
+        for name in ('a', 'b', 'c'):
+            self.vote(name)
+        self.assertEqual(self.vote('d', second).data['votes'], 1)
+        self.option.refresh_from_db()
+        # The first vote flushed inline; the rest wait for the next interval.
+        self.assertEqual(self.option.votes, 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(polls.flush(), 3)
+        self.assertEqual(polls.flush(), 0)
+        self.assertEqual(dict(PollOption.objects.values_list('option_text', 'votes')),
+                         {'Opening': 3, 'Finale': 1})
+
+        self.vote('e')
+        self.assertEqual(polls.flush(), 1)
+        self.assertEqual(PollOption.objects.get(pk=self.option.pk).votes, 4)
+
+    @override_settings(POLL_VOTES_BUFFERED=True, POLL_VOTES_FLUSH_INTERVAL=60)
+    def test_buffered_vote_reports_stored_plus_pending(self):
+        self.vote('a')
+        self.vote('b')
+        stale = PollOption.objects.get(pk=self.option.pk)
+        polls.flush()  # Another worker flushes after this request loaded the option.
+        voter = User.objects.create(username='c')
+        self.assertEqual(polls.cast_vote(stale, voter), 3)
+
+    @override_settings(POLL_VOTES_BUFFERED=True)
+    def test_overlapping_flushes_claim_each_vote_once(self):
+        key = polls.PENDING_KEY.format(self.option.pk)
+        for _ in range(3):
+            polls._buffer_increment(self.option.pk)
+        # Both flushes read 3 before either decrements.
+        self.assertEqual(polls._claim(key, 3), (3, 0))
+        polls._buffer_increment(self.option.pk)
+        self.assertEqual(polls._claim(key, 3), (1, 0))
+        self.assertEqual(cache.get(key), 0)
+
+    @override_settings(POLL_VOTES_BUFFERED=True)
+    def test_flush_between_slot_number_and_slot_waits_for_the_slot(self):
+        set_value = cache.set
+
+        def racing_set(key, *args, **kwargs):
+            if key.startswith(polls.SLOT_KEY.format('')):
+                self.assertEqual(polls.flush(), 0)  # Lands after the incr, before the set.
+            return set_value(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'set', side_effect=racing_set):
+            polls._buffer_increment(self.option.pk)
+        self.assertEqual(polls.flush(), 1)
+        self.assertEqual(PollOption.objects.get(pk=self.option.pk).votes, 1)
+        self.assertEqual(polls.pending_votes([self.option.pk]), {})
+
+    @override_settings(POLL_VOTES_BUFFERED=True)
+    def test_slot_left_empty_is_skipped_after_the_grace_period(self):
+        polls._incr(polls.SLOTS_KEY)  # A voter that died before filling its slot.
+        polls._buffer_increment(self.option.pk)
+        self.assertEqual(polls.flush(), 0)
+        later = time.time() + polls.SLOT_GRACE + 1
+        with mock.patch.object(polls.time, 'time', return_value=later):
+            self.assertEqual(polls.flush(), 1)
+        self.assertEqual(PollOption.objects.get(pk=self.option.pk).votes, 1)
+
+    def test_flush_command_refuses_a_local_memory_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('flush_poll_votes', stdout=io.StringIO())
+
+    def test_results_report_totals_percentages_and_own_vote(self):
+        second = PollOption.objects.create(poll=self.poll, option_text='Finale')
+        results_url = self.url.replace('/vote/', '/results/')
+        self.vote('a')
+        self.vote('b')
+        self.vote('c', second)
+
+        response = self.client.get(results_url)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual([option['percentage'] for option in response.data['options']], [66.7, 33.3])
+        self.assertEqual(response.data['your_vote'], second.pk)
+
+        # Warm tallies are served from the cache and updated in place by new votes.
+        version = response.data['version']
+        self.vote('d', second)
+        with self.assertNumQueries(1):
+            delta = self.client.get(results_url, {'since': version}).data
+        self.assertEqual(delta['total'], 4)
+        self.assertEqual([option['id'] for option in delta['options']], [second.pk])
+        self.assertEqual(delta['percentages'], {str(self.option.pk): 50.0, str(second.pk): 50.0})
+
+        unchanged = self.client.get(results_url, {'since': delta['version']}).data
+        self.assertEqual(unchanged['options'], [])
+
+
+class PollEditTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='Premiere', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(2020, 1, 1), runtime=120)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='editor'))
+
+    def test_create_inserts_options_in_one_query(self):
+        options = [{'option_text': text} for text in ('A', 'B', 'C', 'D')]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/movies/{self.movie.pk}/polls/',
+                                        {'question': 'Pick one', 'options': options}, format='json')
+        self.assertEqual(response.status_code, 201)
+        inserts = [q for q in queries.captured_queries if 'INSERT INTO "movies_polloption"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual([o['option_text'] for o in response.data['options']], ['A', 'B', 'C', 'D'])
+
+    def test_update_keeps_votes_of_matched_options(self):
+        poll = Poll.objects.create(movie=self.movie, question='Best scene?')
+        kept, renamed, dropped = (PollOption.objects.create(poll=poll, option_text=text)
+                                  for text in ('Opening', 'Chase', 'Ending'))
+        for i, option in enumerate((kept, renamed, dropped)):
+            PollVote.objects.create(user=User.objects.create(username=f'v{i}'), poll=poll, option=option)
+
+        payload = {'question': 'Best scene so far?', 'options': [
+            {'id': kept.pk, 'option_text': 'Opening'},
+            {'id': renamed.pk, 'option_text': 'Car chase'},
+            {'option_text': 'Credits'},
+        ]}
+        response = self.client.put(f'/api/movies/{self.movie.pk}/polls/{poll.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(PollVote.objects.values_list('option_id', flat=True)),
+                         [kept.pk, renamed.pk])
+        self.assertEqual(list(poll.options.order_by('pk').values_list('option_text', flat=True)),
+                         ['Opening', 'Car chase', 'Credits'])
+
+        payload['options'] = [{'id': dropped.pk, 'option_text': 'Gone'}]
+        response = self.client.put(f'/api/movies/{self.movie.pk}/polls/{poll.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.director = Person.objects.create(name='Denis Villeneuve')
+        self.dune = Movie.objects.create(title='Dune', short_synopsis='Desert planet epic',
+                                         full_synopsis='Spice and sandworms', release_date=date(2021, 9, 3),
+                                         runtime=155)
+        PersonRole.objects.create(person=self.director, movie=self.dune, role=MovieRole.DIRECTOR)
+        self.show = WebShow.objects.create(title='Dunes of Arrakis', short_synopsis='s', full_synopsis='f',
+                                           seasons_count=1)
+        self.show.streaming_platform.add(Platform.objects.create(name='Streamly'))
+
+    def find(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        return [(hit['type'], hit['id']) for hit in response.data['results']]
+
+    def assert_search_works(self):
+        self.assertEqual(set(self.find('dun')), {('movie', self.dune.pk), ('webshow', self.show.pk)})
+        self.assertEqual(self.find('dune'), [('movie', self.dune.pk), ('webshow', self.show.pk)])
+        self.assertEqual(self.find('villen'), [('person', self.director.pk), ('movie', self.dune.pk)])
+        self.assertEqual(self.find('dune streamly'), [('webshow', self.show.pk)])
+        self.assertEqual(self.find('dune', type='person'), [])
+
+        self.director.name = 'Denis V.'
+        self.director.save()
+        self.assertEqual(self.find('villeneuve'), [])
+        self.dune.delete()
+        self.assertEqual(self.find('spice'), [])
+
+    def test_fts_index(self):
+        self.assertTrue(search.uses_fts())
+        self.assert_search_works()
+        response = self.client.get('/api/movies/', {'search': 'arrakis dunes'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_token_index_fallback(self):
+        with mock.patch.object(search, 'uses_fts', return_value=False):
+            search.rebuild()
+            self.assert_search_works()
+
+    def test_movie_list_search_uses_index(self):
+        response = self.client.get('/api/movies/', {'search': 'sandworm'})
+        self.assertEqual([movie['id'] for movie in response.data['results']], [self.dune.pk])
+        self.assertEqual(response['X-Search-Max-Results'], '200')
+        self.assertNotIn('X-Search-Max-Results', self.client.get('/api/movies/', {'pagination': 'cursor'}))
+
+    def test_fts_table_changes_are_picked_up_while_running(self):
+        self.assertTrue(search.uses_fts())
+        # Dropped by another process: the next search fails over and re-checks.
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {search.FTS_TABLE}")
+        self.assertEqual(search.search('dune'), [])
+        self.assertFalse(search.uses_fts())
+
+        # Created by another process: seen once the cached check expires.
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE {search.FTS_TABLE} USING fts5(title, body)")
+        self.assertFalse(search.uses_fts())
+        later = time.monotonic() + search.FTS_RECHECK_SECONDS + 1
+        with mock.patch.object(search.time, 'monotonic', return_value=later):
+            self.assertTrue(search.uses_fts())
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='The Dark Knight', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(2008, 7, 18), runtime=152)
+        self.person = Person.objects.create(name='Christopher Nolan')
+
+    def complete(self, query):
+        return self.client.get('/api/autocomplete/', {'q': query}).data['results']
+
+    def test_prefix_matches_any_word_start(self):
+        self.assertEqual(self.complete('dark kn'), [{'type': 'movie', 'id': self.movie.pk,
+                                                     'label': 'The Dark Knight'}])
+        self.assertEqual([hit['id'] for hit in self.complete('nol')], [self.person.pk])
+        self.assertEqual(self.complete('ark'), [])
+
+    def test_index_is_reused_until_the_catalog_changes(self):
+        self.complete('the')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.complete('the')), 1)
+
+        self.movie.title = 'The Dark Knight Rises'
+        self.movie.save()
+        self.assertEqual(self.complete('rises')[0]['label'], 'The Dark Knight Rises')
+        Movie.objects.create(title='Theory', short_synopsis='s', full_synopsis='f',
+                             release_date=date(2020, 1, 1), runtime=90)
+        self.assertEqual([hit['label'] for hit in self.complete('the')],
+                         ['Theory', 'The Dark Knight Rises'])
+
+
+class RelatedMovieTests(TestCase):
+    def setUp(self):
+        self.drama, self.noir = Genre.objects.create(name='Drama'), Genre.objects.create(name='Noir')
+        self.director = Person.objects.create(name='Director')
+        self.movies = {}
+        for title in ('Source', 'Same director', 'Same genres', 'Drama only', 'Unrelated'):
+            self.movies[title] = Movie.objects.create(title=title, short_synopsis='s', full_synopsis='f',
+                                                      release_date=date(2020, 1, 1), runtime=100)
+
+    def credit(self, title):
+        PersonRole.objects.create(person=self.director, movie=self.movies[title], role=MovieRole.DIRECTOR)
+
+    def related_titles(self, title, **params):
+        response = self.client.get(f'/api/movies/{self.movies[title].pk}/related/', params)
+        return [movie['title'] for movie in response.data]
+
+    def test_neighbours_are_ranked_and_kept_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for title in ('Source', 'Same genres', 'Drama only'):
+                self.movies[title].genres.add(self.drama)
+            for title in ('Source', 'Same genres'):
+                self.movies[title].genres.add(self.noir)
+            self.movies['Same director'].genres.add(self.noir)
+            self.credit('Source')
+            self.credit('Same director')
+
+        expected = ['Same genres', 'Same director', 'Drama only']
+        self.assertEqual(self.related_titles('Source'), expected)
+        self.assertEqual(self.related_titles('Source', limit=1), ['Same genres'])
+        self.assertIn('Source', self.related_titles('Drama only'))
+
+        related.rebuild()
+        self.assertEqual(self.related_titles('Source'), expected)
+        with self.assertNumQueries(2):
+            self.related_titles('Source')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movies['Source'].genres.remove(self.drama)
+        self.assertNotIn('Drama only', self.related_titles('Source'))
+        self.assertEqual(self.related_titles('Drama only'), ['Same genres'])
+
+    def test_a_credit_write_invalidates_each_derived_view_once(self):
+        movie = self.movies['Source']
+        show = WebShow.objects.create(title='Spin-off', short_synopsis='s', full_synopsis='f',
+                                      seasons_count=1)
+        Movie.objects.filter(pk=movie.pk).update(updated_at=date(2000, 1, 1))
+        with mock.patch.object(related, 'refresh') as refresh, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            role = PersonRole.objects.create(person=self.director, movie=movie, role=MovieRole.DIRECTOR)
+            PersonRole.objects.create(person=self.director, webshow=show, role=MovieRole.DIRECTOR)
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once_with(movie.pk)
+        self.assertGreater(Movie.objects.get(pk=movie.pk).updated_at.year, 2000)
+        for title in (movie, show):  # Already indexed with the new credit.
+            self.assertFalse(search.index_object(title), title)
+
+        with mock.patch.object(related, 'refresh') as refresh, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            role.delete()
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once_with(movie.pk)
+        self.assertFalse(search.index_object(movie))
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.titles = {}
+        for title in ('Alien', 'Aliens', 'Predator', 'Notting Hill'):
+            self.titles[title] = Movie.objects.create(title=title, short_synopsis='s', full_synopsis='f',
+                                                      release_date=date(1990, 1, 1), runtime=100)
+        # Sci-fi fans love the first three and dislike the romance, and vice versa.
+        fans = {'ripley': {'Alien': 5, 'Aliens': 5, 'Notting Hill': 1},
+                'dutch': {'Alien': 4, 'Aliens': 5, 'Predator': 5, 'Notting Hill': 2},
+                'hicks': {'Aliens': 5, 'Predator': 4, 'Notting Hill': 1},
+                'anna': {'Alien': 1, 'Notting Hill': 5}}
+        self.users = {}
+        for name, reviews in fans.items():
+            self.users[name] = User.objects.create(username=name)
+            for title, rating in reviews.items():
+                Review.objects.create(review_user=self.users[name], content_object=self.titles[title],
+                                      review_text='-', rating=rating)
+
+    def recommend(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/recommendations/')
+
+    def test_neighbours_drive_personal_recommendations(self):
+        self.assertGreater(recommendations.build(chunk_size=2), 0)
+        similar = ItemSimilarity.objects.filter(object_id=self.titles['Aliens'].pk).order_by('-score')
+        self.assertEqual(similar.first().similar_object_id, self.titles['Predator'].pk)
+
+        response = self.recommend(self.users['ripley'])
+        self.assertEqual(response.data['source'], 'personal')
+        self.assertEqual([hit['title'] for hit in response.data['results']], ['Predator'])
+
+    def neighbours(self):
+        return sorted(ItemSimilarity.objects.values_list('object_id', 'similar_object_id', 'score'))
+
+    def test_block_size_does_not_change_neighbours(self):
+        recommendations.build(chunk_size=1)
+        one_by_one = self.neighbours()
+        recommendations.build(chunk_size=100)
+        self.assertEqual(len(one_by_one), len(self.neighbours()))
+        for row, expected in zip(one_by_one, self.neighbours()):
+            self.assertEqual(row[:2], expected[:2])
+            self.assertAlmostEqual(row[2], expected[2])
+
+    def test_matrix_is_capped_to_the_latest_reviews(self):
+        recommendations.build(chunk_size=1, max_ratings=7)
+        capped = self.neighbours()
+        self.assertTrue(capped)
+        Review.objects.filter(pk__in=Review.objects.order_by('-id').values('pk')[7:]).delete()
+        recommendations.build()
+        self.assertEqual(capped, self.neighbours())
+
+    def test_cold_start_and_anonymous(self):
+        self.assertEqual(self.recommend(None).status_code, 401)
+        response = self.recommend(User.objects.create(username='newcomer'))
+        self.assertEqual(response.data['source'], 'trending')
+        self.assertEqual(len(response.data['results']), 4)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = self.create_movie('Heat')
+
+    def create_movie(self, title, full_synopsis='f'):
+        return Movie.objects.create(title=title, short_synopsis='s', full_synopsis=full_synopsis,
+                                    release_date=date(2000, 1, 1), runtime=100)
+
+    def review(self):
+        user = User.objects.create(username=f'critic{User.objects.count()}')
+        return Review.objects.create(review_user=user, content_object=self.movie,
+                                     review_text='Tense', rating=4)
+
+    def walk(self, url, params, between_pages=None):
+        ids, response = [], self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                return ids
+            if between_pages:
+                between_pages()
+            response = self.client.get(response.data['next'])
+
+    def test_inserts_between_pages_never_skip_or_repeat_rows(self):
+        movies = [self.movie] + [self.create_movie(f'Movie {n}') for n in range(6)]
+        inserted = []
+
+        def insert():
+            inserted.append(self.create_movie('Late').pk)
+
+        ids = self.walk('/api/movies/', {'pagination': 'cursor', 'page_size': 2}, insert)
+        self.assertEqual(ids, [movie.pk for movie in movies] + inserted)
+
+    def test_tied_ordering_values_fall_back_to_the_primary_key(self):
+        reviews = [self.review() for _ in range(7)]
+        Review.objects.update(timestamp=reviews[0].timestamp)
+        ids = self.walk('/api/reviews/', {'pagination': 'cursor', 'page_size': 3}, self.review)
+        self.assertEqual(ids, [review.pk for review in reversed(reviews)])
+
+    def cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def test_malformed_cursor_is_not_found(self):
+        self.review()
+        cursors = ['not-base64!', 'bm90IGpzb24=', self.cursor([1])]
+        # Well-formed JSON whose values the ordering fields (-timestamp, -id) reject.
+        cursors += [self.cursor(position) for position in (
+            ['notadate', 1], [{'a': 1}, 2], [None, None], ['2024-01-01T00:00:00', 'x'],
+            ['2024-01-01T00:00:00', [1]], ['2024-01-01T00:00:00', 2 ** 80], {'a': 1})]
+        for cursor in cursors:
+            response = self.client.get('/api/reviews/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, base64.urlsafe_b64decode(cursor + '=='))
+            self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+        cursor = self.cursor(['2999-01-01T00:00:00+00:00', 10 ** 6])
+        self.assertEqual(len(self.client.get('/api/reviews/', {'cursor': cursor}).data['results']), 1)
+
+    def test_search_pages_keep_relevance_order(self):
+        synopsis = self.create_movie('Ronin', full_synopsis='A heist')
+        title = self.create_movie('Heist')
+        ranked = [hit['id'] for hit in search.search('heist', kinds=['movie'])]
+        self.assertEqual(ranked, [title.pk, synopsis.pk])
+        ids = self.walk('/api/movies/', {'search': 'heist', 'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual(ids, ranked)
+
+
+class InsightsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+        self.url = f'/api/movies/{self.movie.pk}/insights/'
+
+    def test_matching_etag_skips_building_the_sections(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), set(bundle.SECTIONS))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_follows_section_writes_and_vote_counters(self):
+        params = {'include': 'trivia,fantheories'}
+        etag = self.client.get(self.url, params)['ETag']
+        MovieTrivia.objects.create(movie=self.movie, fact='Shot on location')
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['trivia']), 1)
+
+        theory = FanTheory.objects.create(movie=self.movie, user=User.objects.create(username='fan'),
+                                          theory='It was a dream')
+        etag = self.client.get(self.url, params)['ETag']
+        FanTheory.objects.filter(pk=theory.pk).update(upvotes=F('upvotes') + 1)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['fantheories'][0]['upvotes'], 1)
+
+        # Sections that were not requested leave the tag alone.
+        etag = response['ETag']
+        Award.objects.create(movie=self.movie, name='Oscar', category='Score', year=1996)
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unknown_movie_and_section(self):
+        self.assertEqual(self.client.get('/api/movies/999/insights/').status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'include': 'bloopers'}).status_code, 400)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Heat', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1995, 12, 15), runtime=170)
+
+    def test_responses_are_cached_until_a_dependency_changes(self):
+        url = f'/api/movies/{self.movie.pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):  # The ETag's updated_at lookup.
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn('Authorization', response['Vary'])
+
+        self.movie.genres.add(Genre.objects.create(name='Crime'))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['genres'], ['Crime'])
+
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_reviews_only_evict_their_own_title(self):
+        other = Movie.objects.create(title='Ronin', short_synopsis='s', full_synopsis='f',
+                                     release_date=date(1998, 9, 25), runtime=122)
+        detail, listing = f'/api/movies/{self.movie.pk}/', '/api/movies/'
+        self.client.get(detail)
+        self.client.get(listing)
+
+        user = User.objects.create(username='critic')
+        review = Review.objects.create(review_user=user, content_object=other,
+                                       review_text='Tense', rating=4)
+        ReviewLike.objects.create(like_user=user, review=review)
+        self.assertEqual(self.client.get(detail)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(listing)['X-Cache'], 'HIT')
+
+        Review.objects.create(review_user=user, content_object=self.movie,
+                              review_text='Long', rating=5)
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['reviews'][0]['review_text'], 'Long')
+
+    def test_stats_count_hits_and_misses(self):
+        for _ in range(3):
+            self.client.get('/api/genres/')
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/cache-stats/').data['GenreViewSet']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='Ronin', short_synopsis='s', full_synopsis='f',
+                                          release_date=date(1998, 9, 25), runtime=122)
+        self.url = f'/api/movies/{self.movie.pk}/'
+
+    def test_matching_etag_skips_the_serializer(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Reviews, credits and the movie itself all move the validator.
+        user = User.objects.create(username='critic')
+        Review.objects.create(review_user=user, content_object=self.movie, review_text='Tense', rating=4)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        PersonRole.objects.create(person=Person.objects.create(name='Frankenheimer'),
+                                  movie=self.movie, role=MovieRole.DIRECTOR)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_movies_do_not_invalidate_detail(self):
+        etag = self.client.get(self.url)['ETag']
+        other = Movie.objects.create(title='Other', short_synopsis='s', full_synopsis='f',
+                                     release_date=date(2000, 1, 1), runtime=90)
+        other.title = 'Renamed'
+        other.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_nested_list_validators(self):
+        url = f'/api/movies/{self.movie.pk}/trivia/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        MovieTrivia.objects.create(movie=self.movie, fact='Real car chases')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,77 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+
+from movies import ratings
+from movies.models import Episode, RatingAggregate, ShowRating, WebSeason, WebShow
+
+# Keyed on the show's updated_at, which season and episode writes touch (see
+# signals.show_tree_touched), and on its ShowRating.updated_at, which every rating
+# change to the show, its seasons or its episodes moves (see rollup.apply_review).
+KEY = 'webshow-tree:{}:{}:{}'
+TIMEOUT = 60 * 60 * 6
+
+
+def _image(field):
+    return field.url if field else None
+
+
+def build(show):
+    """The show's seasons and episodes with every level's rating summary, in three queries."""
+    seasons = list(WebSeason.objects.filter(webshow=show).order_by('season_number'))
+    episodes = list(Episode.objects.filter(season__webshow=show)
+                    .order_by('season_id', 'episode_number'))
+
+    types = ContentType.objects.get_for_models(WebShow, WebSeason, Episode)
+    titles = Q(content_type=types[WebShow], object_id=show.pk)
+    if seasons:
+        titles |= Q(content_type=types[WebSeason], object_id__in=[s.pk for s in seasons])
+    if episodes:
+        titles |= Q(content_type=types[Episode], object_id__in=[e.pk for e in episodes])
+    aggregates = {(a.content_type_id, a.object_id): a for a in RatingAggregate.objects.filter(titles)}
+
+    def summary(model, pk):
+        return ratings.summarize(aggregates.get((types[model].id, pk)))
+
+    by_season = {season.pk: [] for season in seasons}
+    for episode in episodes:
+        by_season[episode.season_id].append({
+            'id': episode.pk,
+            'episode_number': episode.episode_number,
+            'title': episode.title,
+            'release_date': episode.release_date,
+            'runtime': episode.runtime,
+            'thumbnail_img': _image(episode.thumbnail_img),
+            'ratings': summary(Episode, episode.pk),
+        })
+    return {
+        'id': show.pk,
+        'title': show.title,
+        'status': show.status,
+        'seasons_count': show.seasons_count,
+        'poster_image': _image(show.poster_image),
+        'ratings': summary(WebShow, show.pk),
+        'seasons': [{
+            'id': season.pk,
+            'season_number': season.season_number,
+            'release_date': season.release_date,
+            'total_episodes': season.total_episodes,
+            'poster_image': _image(season.poster_image),
+            'ratings': summary(WebSeason, season.pk),
+            'episodes': by_season[season.pk],
+        } for season in seasons],
+    }
+
+
+def get(show):
+    """`show` should come with select_related('rollup')."""
+    try:
+        rated_at = show.rollup.updated_at.timestamp()
+    except ShowRating.DoesNotExist:
+        rated_at = None
+    key = KEY.format(show.pk, show.updated_at.timestamp(), rated_at)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build(show)
+        cache.set(key, tree, timeout=TIMEOUT)
+    return tree
@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from movies.models import (Award, BoxOffice, Episode, FanTheory, GalleryImage, Genre, Language,
+                           Movie, MovieTrivia, Person, PersonRole, Platform, Poll, PollOption,
+                           Review, ReviewLike, WebSeason, WebShow)
+
+# One version stamp per catalog model, bumped by signals on every save, delete and m2m change.
+# Cached responses and validators embed the versions of the models they were built from,
+# so a write anywhere in those tables makes them unreachable instead of having to find
+# and delete them.
+KEY = 'model-version:{}'
+TRACKED = frozenset({Award, BoxOffice, Episode, FanTheory, GalleryImage, Genre, Language, Movie,
+                     MovieTrivia, Person, PersonRole, Platform, Poll, PollOption, Review,
+                     ReviewLike, WebSeason, WebShow})
+
+
+def _key(model):
+    return KEY.format(model._meta.label_lower)
+
+
+def bump(*models):
+    for model in models:
+        key = _key(model)
+        # Versions are nanosecond timestamps, so they double as Last-Modified values and
+        # a counter lost to eviction never restarts below an older cached entry's.
+        cache.set(key, max(time.time_ns(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def current(models):
+    """The models' version stamps, in order."""
+    keys = [_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def as_datetime(stamp):
+    return datetime.fromtimestamp(stamp / 1e9, tz=timezone.utc)
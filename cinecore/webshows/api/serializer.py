@@ -7,6 +7,7 @@ from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
 from movies.api.serializer import (GenreSerializer,LanguageSerializer,PlatformSerializer,
                                    ReviewSerializer,ActorRoleSerializer,CrewRoleSerializer,
+                                   EmbeddedReviewsMixin,
                                    )
 
 
@@ -14,9 +15,10 @@ from movies.api.serializer import (GenreSerializer,LanguageSerializer,PlatformSe
 
 class WebShowListSerializer(ModelSerializer):
     genres=GenreSerializer(many=True,read_only=True)
+    rating=serializers.FloatField(source='rollup.score',read_only=True)
     class Meta:
         model=WebShow
-        fields=['title','poster_image','seasons_count','genres','status']
+        fields=['title','poster_image','seasons_count','genres','status','rating']
 
 class WebShowCreateUpdateSerializer(ModelSerializer):
     genres = serializers.PrimaryKeyRelatedField(queryset=Genre.objects.all(), many=True)
@@ -31,39 +33,52 @@ class WebShowCreateUpdateSerializer(ModelSerializer):
                 'is_active','genres','languages','subtitles','streaming_platform',
                 'creator']
 
-class WebShowDetailSerializer(ModelSerializer):
+class WebShowSeasonSerializer(ModelSerializer):
+    # Annotated by WebShowDetailView's seasons prefetch.
+    episode_count=serializers.IntegerField(read_only=True)
+    class Meta:
+        model=WebSeason
+        fields=['id','season_number','poster_image','total_episodes',
+                'episode_count','release_date']
+
+class WebShowDetailSerializer(EmbeddedReviewsMixin,ModelSerializer):
     genres=GenreSerializer(many=True,read_only=True)
     languages=LanguageSerializer(many=True,read_only=True)
     subtitles=LanguageSerializer(many=True,read_only=True)
     streaming_platform=PlatformSerializer(many=True,read_only=True)
     creator=serializers.StringRelatedField(many=True,read_only=True)
-    reviews=ReviewSerializer(many=True,read_only=True)
+    reviews=serializers.SerializerMethodField()
+    reviews_next=serializers.SerializerMethodField()
+    ratings=serializers.SerializerMethodField()
+    reviews_url_name='webshow-reviews'
     cast=serializers.SerializerMethodField()
     director=serializers.SerializerMethodField()
     producer=serializers.SerializerMethodField()
     writer=serializers.SerializerMethodField()
+    seasons=WebShowSeasonSerializer(many=True,read_only=True)
     class Meta:
         model=WebShow
         fields=['title','genres','short_synopsis','full_synopsis','languages',
                 'subtitles','poster_image','backdrop_image',
                 'trailer','streaming_platform','cast','creator','reviews',
-                'director','producer','writer']
+                'reviews_next','ratings','director','producer','writer',
+                'seasons']
         
+    def roles(self,obj,role):
+        # Partition the prefetched webshow_role list instead of filtering per role.
+        return [r for r in obj.webshow_role.all() if r.role==role]
+
     def get_cast(self,obj):
-        role=obj.webshow_role.filter(role=MovieRole.ACTOR)
-        return ActorRoleSerializer(role,many=True).data
+        return ActorRoleSerializer(self.roles(obj,MovieRole.ACTOR),many=True).data
     
     def get_director(self,obj):
-        role=obj.webshow_role.filter(role=MovieRole.DIRECTOR)
-        return CrewRoleSerializer(role,many=True).data
+        return CrewRoleSerializer(self.roles(obj,MovieRole.DIRECTOR),many=True).data
     
     def get_producer(self,obj):
-        role=obj.webshow_role.filter(role=MovieRole.PRODUCER)
-        return CrewRoleSerializer(role,many=True).data
+        return CrewRoleSerializer(self.roles(obj,MovieRole.PRODUCER),many=True).data
     
     def get_writer(self,obj):
-        role=obj.webshow_role.filter(role=MovieRole.WRITER)
-        return CrewRoleSerializer(role,many=True).data
+        return CrewRoleSerializer(self.roles(obj,MovieRole.WRITER),many=True).data
 
 class WebSeasonListSerializer(ModelSerializer):
     webshow=WebShowListSerializer(read_only=True)
@@ -72,14 +87,17 @@ class WebSeasonListSerializer(ModelSerializer):
         fields=['id','webshow','season_number','poster_image']
 
 
-class WebSeasonDetailSerializer(ModelSerializer):
+class WebSeasonDetailSerializer(EmbeddedReviewsMixin,ModelSerializer):
     webshow=WebShowListSerializer(read_only=True)
-    reviews=ReviewSerializer(many=True,read_only=True)
+    reviews=serializers.SerializerMethodField()
+    reviews_next=serializers.SerializerMethodField()
+    ratings=serializers.SerializerMethodField()
+    reviews_url_name='season-reviews'
     class Meta:
         model=WebSeason
         fields=['id','webshow','season_number','poster_image',
                 'description','total_episodes','release_date',
-                'reviews']
+                'reviews','reviews_next','ratings']
 
 
 class WebSeasonCreateUpdateSerializer(ModelSerializer):
@@ -95,13 +113,16 @@ class WebSeasonEpisodeListSerializer(ModelSerializer):
         fields=['id','title','episode_number','release_date','thumbnail_img',
                 'runtime']
 
-class WebShowEpisodeDetailSerializer(ModelSerializer):
-    reviews=ReviewSerializer(many=True,read_only=True)
+class WebShowEpisodeDetailSerializer(EmbeddedReviewsMixin,ModelSerializer):
+    reviews=serializers.SerializerMethodField()
+    reviews_next=serializers.SerializerMethodField()
+    ratings=serializers.SerializerMethodField()
+    reviews_url_name='episode-reviews'
     season=WebSeasonListSerializer(read_only=True)
     class Meta:
         model=Episode
         fields=['id','season','title','episode_number','description','release_date','thumbnail_img',
-                'runtime','reviews']
+                'runtime','reviews','reviews_next','ratings']
 
 
 class EpisodeCreateUpdateSerializer(ModelSerializer):
@@ -2,16 +2,27 @@ from django.urls import path
 from webshows.api.views import (WebShowListView,WebShowDetailView,WebSeasonListView,
                               WebSeasonDetailView,WebShowEpisodeListView,
                               WebShowEpisodeDetailView,WebShowReviewView,
-                              EpisodeReviewView,SeasonReviewView)
+                              EpisodeReviewView,SeasonReviewView,WebShowTreeView,
+                              WebShowRatingView,WebSeasonBulkCreateView,
+                              EpisodeBulkCreateView)
+from movies.api.views import RatingSummaryView
+from movies.models import WebShow,WebSeason,Episode
 
 urlpatterns = [
     path('webshow/',WebShowListView.as_view(),name='web-show'),
     path('webshow/<int:pk>/',WebShowDetailView.as_view(),name='movie-detail'),
     path('webshow/<int:pk>/seasons/',WebSeasonListView.as_view()),
+    path('webshow/<int:pk>/seasons/bulk/',WebSeasonBulkCreateView.as_view()),
+    path('webshow/<int:pk>/tree/',WebShowTreeView.as_view()),
     path('seasons/<int:pk>/',WebSeasonDetailView.as_view()),
     path('season/<int:pk>/episodes/',WebShowEpisodeListView.as_view()),
+    path('season/<int:pk>/episodes/bulk/',EpisodeBulkCreateView.as_view()),
     path('episodes/<int:pk>/',WebShowEpisodeDetailView.as_view()),
-    path('webshow/<int:pk>/review/',WebShowReviewView.as_view()),
-    path('season/<int:pk>/review/',SeasonReviewView.as_view()),
-    path('episode/<int:pk>/review/',EpisodeReviewView.as_view()),
+    path('webshow/<int:pk>/review/',WebShowReviewView.as_view(),name='webshow-reviews'),
+    path('season/<int:pk>/review/',SeasonReviewView.as_view(),name='season-reviews'),
+    path('episode/<int:pk>/review/',EpisodeReviewView.as_view(),name='episode-reviews'),
+    path('webshow/<int:pk>/review/summary/',RatingSummaryView.as_view(model=WebShow)),
+    path('webshow/<int:pk>/review/rollup/',WebShowRatingView.as_view()),
+    path('season/<int:pk>/review/summary/',RatingSummaryView.as_view(model=WebSeason)),
+    path('episode/<int:pk>/review/summary/',RatingSummaryView.as_view(model=Episode)),
 ]
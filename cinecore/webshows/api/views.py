@@ -4,14 +4,66 @@ from webshows.api.serializer import (WebShowListSerializer,WebShowCreateUpdateSe
                                      WebShowDetailSerializer,WebSeasonListSerializer,
                                      WebSeasonCreateUpdateSerializer,WebSeasonDetailSerializer,
                                      WebSeasonEpisodeListSerializer,EpisodeCreateUpdateSerializer,
-                                     WebShowEpisodeDetailSerializer,ReviewSerializer)
+                                     WebShowEpisodeDetailSerializer,WebShowSeasonSerializer,
+                                     ReviewSerializer)
+from movies.api.caching import CachedResponseMixin, ConditionalGetMixin, title_timestamps
+from movies.api.pagination import KeysetPagination, ReviewPagination
+from movies.api.permission import IsAdminOrReadonly
+from movies.api.serializer import embedded_review_limit,embedded_reviews_prefetch
+from movies import rollup, tree, versions
 from django.contrib.contenttypes.models import ContentType
+from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Now
+from django_filters.rest_framework import DjangoFilterBackend
+import django_filters
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.generics import (ListAPIView,
                                      RetrieveUpdateDestroyAPIView,
                                     ListCreateAPIView)
 
-class WebShowListView(ListCreateAPIView):
-    queryset=WebShow.objects.all()
+def compact_requested(request):
+    """?compact=1 drops the parent show from list items; the client already knows it."""
+    return request.query_params.get('compact','').lower() in ('1','true','yes')
+
+
+class WebShowFilter(django_filters.FilterSet):
+    status=django_filters.ChoiceFilter(choices=ShowStatus.choices)
+    genre=django_filters.NumberFilter(field_name='genres')
+    platform=django_filters.NumberFilter(field_name='streaming_platform')
+    language=django_filters.NumberFilter(field_name='languages')
+
+    class Meta:
+        model=WebShow
+        fields=['status','genre','platform','language']
+
+
+class WebShowOrdering(OrderingFilter):
+    """?ordering=rating sorts on the persisted rollup (see movies.rollup), so it reads
+    show_rating_score_idx instead of the review table."""
+    aliases={'rating':'rollup__score'}
+
+    def get_ordering(self, request, queryset, view):
+        return [('-' if field.startswith('-') else '')+self.aliases.get(field.lstrip('-'),field.lstrip('-'))
+                for field in super().get_ordering(request, queryset, view)]
+
+
+class WebShowListView(ConditionalGetMixin, ListCreateAPIView):
+    permission_classes=[IsAdminOrReadonly]
+    # Every show gets its ShowRating row when it is created (and from the migration).
+    queryset=WebShow.objects.select_related('rollup').prefetch_related('genres')
+    validator_models=(WebShow, Genre, Platform, Language, Review)
+    filter_backends=[DjangoFilterBackend, WebShowOrdering]
+    filterset_class=WebShowFilter
+    ordering_fields=['title','rating']
+    ordering=['title']
+    pagination_class=KeysetPagination
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return WebShowListSerializer
@@ -22,14 +74,25 @@ class WebShowListView(ListCreateAPIView):
  
 
 
-class WebShowDetailView(RetrieveUpdateDestroyAPIView):
+class WebShowDetailView(ConditionalGetMixin, CachedResponseMixin, RetrieveUpdateDestroyAPIView):
+    permission_classes=[IsAdminOrReadonly]
     queryset=WebShow.objects.prefetch_related(
         'genres', 'languages', 'subtitles', 'streaming_platform',
         'creator',
         'webshow_role__person',
-        'seasons',
-        'reviews'
+        Prefetch('seasons',queryset=WebSeason.objects.annotate(
+            episode_count=Count('episodes')).order_by('season_number')),
+        'rating_aggregates'
     )
+    cache_detail_models=(WebSeason, Genre, Language, Platform, Person)
+    
+    def object_timestamps(self):
+        return title_timestamps(WebShow, self.kwargs['pk'], 'updated_at')
+
+    def get_queryset(self):
+        return self.queryset.prefetch_related(
+            embedded_reviews_prefetch(embedded_review_limit(self.request)))
+    
     def get_serializer_class(self):
         if self.request.method in ['PUT','PATCH']:
             return WebShowCreateUpdateSerializer
@@ -38,52 +101,189 @@ class WebShowDetailView(RetrieveUpdateDestroyAPIView):
         
 
 
-class WebSeasonListView (ListCreateAPIView):
-    queryset= WebSeason.objects.select_related('webshow').all()
+class WebShowTreeView(APIView):
+    """The show's full season/episode hierarchy with ratings at every level."""
+
+    def get(self, request, pk):
+        show=get_object_or_404(WebShow.objects.select_related('rollup').only(
+            'title','status','seasons_count','poster_image','updated_at','rollup__updated_at'),pk=pk)
+        return Response(tree.get(show))
+
+
+class WebShowRatingView(APIView):
+    """The show's rollup score and the per-level review totals it is built from."""
+
+    def get(self, request, pk):
+        show=get_object_or_404(WebShow.objects.select_related('rollup'),pk=pk)
+        return Response(rollup.summary(getattr(show,'rollup',None)))
+
+
+class WebSeasonListView (ConditionalGetMixin, ListCreateAPIView):
+    permission_classes=[IsAdminOrReadonly]
+    queryset= WebSeason.objects.order_by('season_number')
+    validator_models=(WebSeason, WebShow, Genre, Review)
+    pagination_class=KeysetPagination
     
     def get_serializer_class(self):
         if self.request.method=='GET':
+            if compact_requested(self.request):
+                return WebShowSeasonSerializer
             return WebSeasonListSerializer
         elif self.request.method=='POST':
             return WebSeasonCreateUpdateSerializer
         return WebSeasonListSerializer
     
     def get_queryset(self):
-        pk = self.kwargs.get('pk') 
-        print(pk)
-        return WebSeason.objects.filter(webshow_id=pk)
+        queryset=self.queryset.filter(webshow_id=self.kwargs.get('pk'))
+        if self.request.method!='GET':
+            return queryset
+        if compact_requested(self.request):
+            return queryset.annotate(episode_count=Count('episodes'))
+        # Every season shares one show, so its genres are fetched once, not per season.
+        return queryset.select_related('webshow__rollup').prefetch_related('webshow__genres')
     
     def perform_create(self, serializer):
-        pk=self.kwargs.get('pk')
-        webshow=WebShow.objects.get(pk=pk)
-        print(webshow)
-        serializer.save(webshow=webshow)
+        serializer.save(webshow=get_object_or_404(WebShow,pk=self.kwargs.get('pk')))
     
  
 
 
-class WebSeasonDetailView(RetrieveUpdateDestroyAPIView):
-    queryset=WebSeason.objects.select_related('webshow').all()
+def _child_count(model, parent_field):
+    return Subquery(model.objects.filter(**{parent_field: OuterRef('pk')}).order_by()
+                    .values(parent_field).annotate(count=Count('pk')).values('count'))
+
+
+class BulkCreateView(APIView):
+    """POST a list of children of one parent: every item is validated first, then all
+    of them are inserted with one bulk_create and the parent's counter recounted once.
+
+    A 400 response is a list aligned with the request, holding each item's errors
+    (`{}` for valid items), including clashes on the parent's unique number.
+    """
+    permission_classes=[IsAdminOrReadonly]
+    parent_model=None
+    parent_field=None
+    number_field=None
+    serializer_class=None
+    response_serializer_class=None
+
+    def post(self, request, pk):
+        items=request.data
+        if not isinstance(items,list) or not items:
+            raise ValidationError({'non_field_errors':['Expected a non-empty list.']})
+        with transaction.atomic():
+            parent=get_object_or_404(self.parent_model,pk=pk)
+            rows,errors=self.validate(parent,items)
+            if any(errors):
+                return Response(errors,status=status.HTTP_400_BAD_REQUEST)
+            try:
+                with transaction.atomic():
+                    created=self.serializer_class.Meta.model.objects.bulk_create(rows)
+            except IntegrityError:
+                raise ValidationError({'non_field_errors':[
+                    f'A concurrent request added a conflicting {self.number_field}; retry.']})
+            self.recount(parent)
+        return Response(self.response_serializer_class(created,many=True).data,
+                        status=status.HTTP_201_CREATED)
+
+    def validate(self, parent, items):
+        model=self.serializer_class.Meta.model
+        rows,errors,numbers=[],[],{}
+        for index,item in enumerate(items):
+            serializer=self.serializer_class(data=item)
+            if serializer.is_valid():
+                rows.append(model(**serializer.validated_data,**{self.parent_field:parent}))
+                errors.append({})
+            else:
+                errors.append(dict(serializer.errors))
+            # Clashes are reported on invalid items too, so one round fixes everything.
+            number=self.item_number(serializer,item)
+            if number is not None:
+                numbers.setdefault(number,[]).append(index)
+
+        taken=set(model.objects.filter(**{self.parent_field:parent,
+                                          f'{self.number_field}__in':list(numbers)})
+                  .values_list(self.number_field,flat=True))
+        for number,indexes in numbers.items():
+            if number in taken:
+                message=f'{self.number_field} {number} already exists.'
+            elif len(indexes)>1:
+                message=f'{self.number_field} {number} appears more than once in this request.'
+            else:
+                continue
+            for index in indexes:
+                errors[index].setdefault(self.number_field,[]).append(message)
+        return rows,errors
+
+    def item_number(self, serializer, item):
+        if not serializer.errors:
+            return serializer.validated_data[self.number_field]
+        if not isinstance(item,dict) or self.number_field not in item:
+            return None
+        try:
+            return serializer.fields[self.number_field].run_validation(item[self.number_field])
+        except ValidationError:
+            return None
+
+
+class WebSeasonBulkCreateView(BulkCreateView):
+    parent_model=WebShow
+    parent_field='webshow'
+    number_field='season_number'
+    serializer_class=WebSeasonCreateUpdateSerializer
+    response_serializer_class=WebSeasonCreateUpdateSerializer
+
+    def recount(self, show):
+        # bulk_create sends no signals, so do what the per-row receivers would have.
+        WebShow.objects.filter(pk=show.pk).update(
+            seasons_count=Coalesce(_child_count(WebSeason,'webshow'),0),updated_at=Now())
+        versions.bump(WebSeason,WebShow)
+
+
+class EpisodeBulkCreateView(BulkCreateView):
+    parent_model=WebSeason
+    parent_field='season'
+    number_field='episode_number'
+    serializer_class=EpisodeCreateUpdateSerializer
+    response_serializer_class=WebSeasonEpisodeListSerializer
+
+    def recount(self, season):
+        WebSeason.objects.filter(pk=season.pk).update(
+            total_episodes=Coalesce(_child_count(Episode,'season'),0))
+        WebShow.objects.filter(pk=season.webshow_id).update(updated_at=Now())
+        versions.bump(Episode,WebSeason,WebShow)
+
+
+class WebSeasonDetailView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
+    permission_classes=[IsAdminOrReadonly]
+    queryset=WebSeason.objects.select_related('webshow__rollup').prefetch_related(
+        'webshow__genres','rating_aggregates')
+    validator_models=(WebSeason, WebShow, Genre, Review)
     # serializer_class=WebSeasonDetailSerializer   
     
+    def object_timestamps(self):
+        return title_timestamps(WebSeason, self.kwargs['pk'])
+
+    def get_queryset(self):
+        return self.queryset.prefetch_related(
+            embedded_reviews_prefetch(embedded_review_limit(self.request)))
+    
     def get_serializer_class(self):
         if self.request.method in ['PUT','PATCH']:
             return WebSeasonCreateUpdateSerializer
         return WebSeasonDetailSerializer
  
-class WebShowEpisodeListView(ListCreateAPIView):
-    queryset=Episode.objects.select_related('season').all()
+class WebShowEpisodeListView(ConditionalGetMixin, ListCreateAPIView):
+    permission_classes=[IsAdminOrReadonly]
+    queryset=Episode.objects.order_by('episode_number')
+    validator_models=(Episode,)
+    pagination_class=KeysetPagination
     
     def get_queryset(self):
-        pk=self.kwargs.get('pk')
-        return Episode.objects.filter(season=pk)
+        return self.queryset.filter(season=self.kwargs.get('pk'))
     
     def perform_create(self, serializer):
-        pk=self.kwargs.get('pk')
-        print(pk)
-        season=WebSeason.objects.get(id=pk)
-        print(season)
-        serializer.save(season=season)
+        serializer.save(season=get_object_or_404(WebSeason,pk=self.kwargs.get('pk')))
     
     def get_serializer_class(self):
         if self.request.method=="GET":
@@ -92,8 +292,19 @@ class WebShowEpisodeListView(ListCreateAPIView):
             return EpisodeCreateUpdateSerializer   
         return WebSeasonEpisodeListSerializer
 
-class WebShowEpisodeDetailView(RetrieveUpdateDestroyAPIView):
-    queryset=Episode.objects.all()
+class WebShowEpisodeDetailView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
+    permission_classes=[IsAdminOrReadonly]
+    queryset=Episode.objects.select_related('season__webshow__rollup').prefetch_related(
+        'season__webshow__genres','rating_aggregates')
+    validator_models=(Episode, WebSeason, WebShow, Genre, Review)
+    
+    def object_timestamps(self):
+        return title_timestamps(Episode, self.kwargs['pk'])
+
+    def get_queryset(self):
+        return self.queryset.prefetch_related(
+            embedded_reviews_prefetch(embedded_review_limit(self.request)))
+    
     def get_serializer_class(self):
         if self.request.method in ['PUT','PATCH']:
             return EpisodeCreateUpdateSerializer
@@ -101,6 +312,7 @@ class WebShowEpisodeDetailView(RetrieveUpdateDestroyAPIView):
 
 class WebShowReviewView(ListAPIView):
     serializer_class=ReviewSerializer
+    pagination_class=ReviewPagination
     
     def get_queryset(self):
         webshow_pk = self.kwargs.get('pk')
@@ -108,7 +320,7 @@ class WebShowReviewView(ListAPIView):
         return Review.objects.filter(
             content_type=webshow_ct,
             object_id=webshow_pk
-        )
+        ).select_related('review_user').order_by('-timestamp','-id')
         
 # def get_queryset(self):
 #         webshow_id = self.kwargs.get('pk')
@@ -119,20 +331,22 @@ class WebShowReviewView(ListAPIView):
 
 class EpisodeReviewView(ListAPIView):
     serializer_class=ReviewSerializer
+    pagination_class=ReviewPagination
     def get_queryset(self):
         episode_id=self.kwargs.get('pk')
         episode_ct=ContentType.objects.get_for_model(Episode)
         return Review.objects.filter(
             content_type=episode_ct,
             object_id=episode_id
-        )
+        ).select_related('review_user').order_by('-timestamp','-id')
 
 class SeasonReviewView(ListAPIView):
     serializer_class=ReviewSerializer
+    pagination_class=ReviewPagination
     def get_queryset(self):
         season_id=self.kwargs.get('pk')
         season_ct=ContentType.objects.get_for_model(WebSeason)
         return Review.objects.filter(
             content_type=season_ct,
             object_id=season_id
-        )
\ No newline at end of file
+        ).select_related('review_user').order_by('-timestamp','-id')
\ No newline at end of file
@@ -1,3 +1,365 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from movies import rollup
+from movies.models import (Episode, Genre, Language, MovieRole, Person, PersonRole, Platform,
+                           Review, ReviewLike, ShowRating, ShowStatus, WebSeason, WebShow)
+
+
+class WebShowPermissionTests(TestCase):
+    """Webshow, season and episode writes are limited to staff; reads stay public."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.show = WebShow.objects.create(title='Locked', short_synopsis='s', full_synopsis='f',
+                                           seasons_count=0)
+        self.season = WebSeason.objects.create(webshow=self.show, season_number=1,
+                                               total_episodes=0, release_date=date(2020, 1, 1))
+
+    def test_anonymous_and_regular_users_cannot_write(self):
+        writes = [
+            ('post', '/api/webshow/'),
+            ('patch', f'/api/webshow/{self.show.pk}/'),
+            ('delete', f'/api/webshow/{self.show.pk}/'),
+            ('post', f'/api/webshow/{self.show.pk}/seasons/'),
+            ('delete', f'/api/seasons/{self.season.pk}/'),
+            ('post', f'/api/season/{self.season.pk}/episodes/'),
+        ]
+        for method, url in writes:
+            self.assertEqual(getattr(self.client, method)(url, {}, format='json').status_code,
+                             401, url)
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+        for method, url in writes:
+            self.assertEqual(getattr(self.client, method)(url, {}, format='json').status_code,
+                             403, url)
+        self.assertEqual(self.client.get(f'/api/webshow/{self.show.pk}/').status_code, 200)
+        self.assertTrue(WebShow.objects.filter(pk=self.show.pk).exists())
+
+
+class WebShowDetailQueryTests(TestCase):
+    """The webshow detail payload is built from a fixed number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.show = WebShow.objects.create(title='Query Count', short_synopsis='s',
+                                           full_synopsis='f', seasons_count=0)
+        self.show.genres.add(Genre.objects.create(name='Drama'))
+        self.people = 0
+
+    def add_credits_seasons_and_reviews(self, count):
+        for _ in range(count):
+            self.people += 1
+            person = Person.objects.create(name=f'Person {self.people}')
+            self.show.creator.add(person)
+            for role in (MovieRole.ACTOR, MovieRole.DIRECTOR, MovieRole.PRODUCER, MovieRole.WRITER):
+                PersonRole.objects.create(person=person, webshow=self.show, role=role)
+            season = WebSeason.objects.create(webshow=self.show, season_number=self.people,
+                                              total_episodes=2, release_date=date(2020, 1, 1))
+            for number in (1, 2):
+                Episode.objects.create(season=season, episode_number=number, title=f'E{number}',
+                                       description='d', release_date=date(2020, 1, 1), runtime=40)
+            user = User.objects.create(username=f'user{self.people}')
+            review = Review.objects.create(review_user=user, content_object=self.show,
+                                           review_text='Great', rating=4)
+            ReviewLike.objects.create(like_user=user, review=review)
+
+    def get_detail(self):
+        return self.client.get(f'/api/webshow/{self.show.pk}/')
+
+    def test_query_count_does_not_grow_with_credits_seasons_or_reviews(self):
+        self.add_credits_seasons_and_reviews(1)
+        with CaptureQueriesContext(connection) as baseline:
+            response = self.get_detail()
+        self.assertEqual(len(response.data['cast']), 1)
+
+        self.add_credits_seasons_and_reviews(5)
+        with self.assertNumQueries(len(baseline.captured_queries)):
+            response = self.get_detail()
+        for field in ('cast', 'director', 'producer', 'writer', 'creator', 'seasons'):
+            self.assertEqual(len(response.data[field]), 6, field)
+        self.assertEqual(response.data['reviews'][0]['likes_count'], 1)
+        self.assertEqual(response.data['cast'][0]['person'], 'Person 1')
+        self.assertEqual([season['season_number'] for season in response.data['seasons']],
+                         [1, 2, 3, 4, 5, 6])
+        self.assertEqual(response.data['seasons'][0]['episode_count'], 2)
+
+
+class WebShowListTests(TestCase):
+    """Webshow, season and episode lists are paginated by cursor, filterable and prefetched."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.drama = Genre.objects.create(name='Drama')
+        self.comedy = Genre.objects.create(name='Comedy')
+        self.netflix = Platform.objects.create(name='Netflix')
+        self.english = Language.objects.create(name='english')
+        self.shows = []
+        for number in range(12):
+            show = WebShow.objects.create(title=f'Show {number:02}', short_synopsis='s',
+                                          full_synopsis='f', seasons_count=1,
+                                          status=ShowStatus.ONGOING if number % 2 else ShowStatus.COMPLETED)
+            show.genres.add(self.drama if number % 3 else self.comedy)
+            if number < 4:
+                show.streaming_platform.add(self.netflix)
+                show.languages.add(self.english)
+            self.shows.append(show)
+        self.show = self.shows[0]
+        for number in range(1, 4):
+            season = WebSeason.objects.create(webshow=self.show, season_number=number,
+                                              total_episodes=2, release_date=date(2020, 1, 1))
+            for episode in (1, 2):
+                Episode.objects.create(season=season, episode_number=episode, title=f'E{episode}',
+                                       description='d', release_date=date(2020, 1, 1), runtime=40)
+        self.season = self.show.seasons.get(season_number=1)
+
+    def titles(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            titles += [show['title'] for show in response.data['results']]
+            url = response.data['next']
+        return titles
+
+    def test_shows_page_by_cursor_in_title_order(self):
+        response = self.client.get('/api/webshow/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(self.titles('/api/webshow/?page_size=5'),
+                         [f'Show {number:02}' for number in range(12)])
+
+    def test_show_filters(self):
+        self.assertEqual(len(self.titles('/api/webshow/?status=ongoing')), 6)
+        self.assertEqual(self.titles(f'/api/webshow/?genre={self.comedy.pk}'),
+                         ['Show 00', 'Show 03', 'Show 06', 'Show 09'])
+        self.assertEqual(self.titles(f'/api/webshow/?platform={self.netflix.pk}&status=completed'),
+                         ['Show 00', 'Show 02'])
+        self.assertEqual(len(self.titles(f'/api/webshow/?language={self.english.pk}')), 4)
+        self.assertEqual(self.client.get('/api/webshow/?status=cancelled').status_code, 400)
+
+    def test_show_list_genres_are_prefetched(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/webshow/?page_size=2')
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get('/api/webshow/?page_size=10')
+        self.assertEqual(response.data['results'][0]['genres'][0]['name'], 'Comedy')
+
+    def test_seasons_full_and_compact(self):
+        url = f'/api/webshow/{self.show.pk}/seasons/'
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([season['season_number'] for season in response.data['results']], [1, 2, 3])
+        self.assertEqual(response.data['results'][0]['webshow']['title'], 'Show 00')
+
+        response = self.client.get(url + '?compact=1&page_size=2')
+        self.assertNotIn('webshow', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['episode_count'], 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([season['season_number'] for season in response.data['results']], [3])
+        self.assertIsNone(response.data['next'])
+
+    def test_episodes_page_by_cursor(self):
+        response = self.client.get(f'/api/season/{self.season.pk}/episodes/?page_size=1')
+        self.assertEqual(response.data['results'][0]['episode_number'], 1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['episode_number'], 2)
+        self.assertIsNone(response.data['next'])
+
+
+class WebShowTreeTests(TestCase):
+    """The season/episode tree is built in four queries and cached until the show changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.show = WebShow.objects.create(title='Tree', short_synopsis='s', full_synopsis='f',
+                                           seasons_count=2)
+        self.seasons = [WebSeason.objects.create(webshow=self.show, season_number=number,
+                                                 total_episodes=3, release_date=date(2020, 1, 1))
+                        for number in (2, 1)]
+        for season in self.seasons:
+            for number in (3, 1, 2):
+                Episode.objects.create(season=season, episode_number=number, title=f'E{number}',
+                                       description='d', release_date=date(2020, 1, 1), runtime=40)
+        self.user = User.objects.create(username='viewer')
+        self.episode = self.seasons[1].episodes.get(episode_number=1)
+        Review.objects.create(review_user=self.user, content_object=self.episode,
+                              review_text='Great', rating=5)
+        ContentType.objects.get_for_models(WebShow, WebSeason, Episode)
+        self.url = f'/api/webshow/{self.show.pk}/tree/'
+
+    def test_tree_shape_and_query_count(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        seasons = response.data['seasons']
+        self.assertEqual([season['season_number'] for season in seasons], [1, 2])
+        self.assertEqual([episode['episode_number'] for episode in seasons[0]['episodes']], [1, 2, 3])
+        self.assertEqual(seasons[0]['episodes'][0]['ratings']['audience'], {'avg': 5.0, 'count': 1})
+        self.assertEqual(seasons[1]['episodes'][0]['ratings']['audience']['count'], 0)
+        self.assertEqual(response.data['ratings']['audience']['count'], 0)
+
+    def test_cached_until_the_tree_or_its_reviews_change(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        self.episode.title = 'Pilot'
+        self.episode.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['seasons'][0]['episodes'][0]['title'], 'Pilot')
+
+        Review.objects.create(review_user=User.objects.create(username='other'),
+                              content_object=self.episode, review_text='Fine', rating=3)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['seasons'][0]['episodes'][0]['ratings']['audience']['count'], 2)
+
+    def test_reviews_elsewhere_keep_the_cached_tree(self):
+        self.client.get(self.url)
+        other = WebShow.objects.create(title='Other', short_synopsis='s', full_synopsis='f',
+                                       seasons_count=0)
+        Review.objects.create(review_user=self.user, content_object=other, review_text='Meh',
+                              rating=2)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_missing_show(self):
+        self.assertEqual(self.client.get('/api/webshow/0/tree/').status_code, 404)
+
+
+class ShowRatingRollupTests(TestCase):
+    """Show ratings roll up show, season and episode reviews and stay in step with writes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = iter(User.objects.create(username=f'user{number}') for number in range(20))
+        self.shows = [WebShow.objects.create(title=title, short_synopsis='s', full_synopsis='f',
+                                             seasons_count=1) for title in ('Alpha', 'Beta', 'Gamma')]
+        self.season = WebSeason.objects.create(webshow=self.shows[0], season_number=1,
+                                               total_episodes=1, release_date=date(2020, 1, 1))
+        self.episode = Episode.objects.create(season=self.season, episode_number=1, title='Pilot',
+                                              description='d', release_date=date(2020, 1, 1),
+                                              runtime=40)
+
+    def review(self, title, rating):
+        return Review.objects.create(review_user=next(self.users), content_object=title,
+                                     review_text='Review', rating=rating)
+
+    def rollup(self, show):
+        return ShowRating.objects.get(webshow=show)
+
+    def test_levels_are_weighted_and_match_a_rebuild(self):
+        self.review(self.shows[0], 4)
+        self.review(self.season, 2)
+        self.review(self.season, 4)
+        review = self.review(self.episode, 5)
+        entry = self.rollup(self.shows[0])
+        self.assertEqual((entry.show_count, entry.season_count, entry.episode_count), (1, 2, 1))
+        self.assertAlmostEqual(entry.score, 0.5 * 4 + 0.3 * 3 + 0.2 * 5)
+
+        review.delete()
+        self.assertAlmostEqual(self.rollup(self.shows[0]).score, (0.5 * 4 + 0.3 * 3) / 0.8)
+
+        incremental = self.rollup(self.shows[0]).score
+        rollup.rebuild()
+        self.assertAlmostEqual(self.rollup(self.shows[0]).score, incremental)
+        self.assertEqual(self.rollup(self.shows[1]).score, 0)
+
+    def test_list_sorts_by_rating(self):
+        self.review(self.episode, 2)
+        self.review(self.shows[2], 5)
+        response = self.client.get('/api/webshow/?ordering=-rating&page_size=2')
+        self.assertEqual([show['title'] for show in response.data['results']], ['Gamma', 'Alpha'])
+        self.assertEqual(response.data['results'][0]['rating'], 5.0)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([show['title'] for show in response.data['results']], ['Beta'])
+        self.assertEqual(response.data['results'][0]['rating'], 0.0)
+        response = self.client.get('/api/webshow/?ordering=rating')
+        self.assertEqual([show['title'] for show in response.data['results']],
+                         ['Beta', 'Alpha', 'Gamma'])
+
+    def test_rollup_endpoint(self):
+        self.review(self.season, 3)
+        response = self.client.get(f'/api/webshow/{self.shows[0].pk}/review/rollup/')
+        self.assertEqual(response.data['score'], 3.0)
+        self.assertEqual(response.data['seasons'], {'avg': 3.0, 'count': 1, 'weight': 0.3})
+
+
+class BulkCreateTests(TestCase):
+    """Seasons and episodes are created in bulk, all or nothing, with per-item errors."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='editor', is_staff=True))
+        self.show = WebShow.objects.create(title='Bulk', short_synopsis='s', full_synopsis='f',
+                                           seasons_count=0)
+        self.season = WebSeason.objects.create(webshow=self.show, season_number=1,
+                                               total_episodes=0, release_date=date(2020, 1, 1))
+        Episode.objects.create(season=self.season, episode_number=1, title='Pilot',
+                               description='d', release_date=date(2020, 1, 1), runtime=40)
+
+    def episode(self, number, **fields):
+        return {'episode_number': number, 'title': f'E{number}', 'description': 'd',
+                'release_date': '2020-01-01', 'runtime': 40, **fields}
+
+    def test_episodes_created_in_one_insert_and_counted_once(self):
+        url = f'/api/season/{self.season.pk}/episodes/bulk/'
+        response = self.client.post(url, [self.episode(number) for number in range(2, 12)],
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 10)
+        self.assertTrue(all(episode['id'] for episode in response.data))
+        self.season.refresh_from_db()
+        self.assertEqual(self.season.total_episodes, 11)
+
+    def test_errors_are_reported_per_item_and_nothing_is_saved(self):
+        url = f'/api/season/{self.season.pk}/episodes/bulk/'
+        items = [self.episode(1), self.episode(2), self.episode(3), self.episode(3),
+                 self.episode(4, runtime='long'), self.episode(1, title=''),
+                 self.episode('x', runtime='long')]
+        response = self.client.post(url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already exists', response.data[0]['episode_number'][0])
+        self.assertEqual(response.data[1], {})
+        self.assertIn('more than once', response.data[2]['episode_number'][0])
+        self.assertIn('more than once', response.data[3]['episode_number'][0])
+        self.assertIn('runtime', response.data[4])
+        self.assertNotIn('episode_number', response.data[4])
+        self.assertIn('title', response.data[5])
+        self.assertIn('already exists', response.data[5]['episode_number'][0])
+        self.assertEqual(len(response.data[6]['episode_number']), 1)
+        self.assertEqual(self.season.episodes.count(), 1)
+
+    def test_bulk_writes_need_staff(self):
+        urls = [f'/api/season/{self.season.pk}/episodes/bulk/',
+                f'/api/webshow/{self.show.pk}/seasons/bulk/']
+        anonymous = APIClient()
+        user = APIClient()
+        user.force_authenticate(User.objects.create(username='viewer'))
+        for url in urls:
+            self.assertEqual(anonymous.post(url, [self.episode(2)], format='json').status_code, 401)
+            self.assertEqual(user.post(url, [self.episode(2)], format='json').status_code, 403)
+        self.assertEqual(self.season.episodes.count(), 1)
+
+    def test_seasons_and_missing_parents(self):
+        seasons = [{'season_number': number, 'total_episodes': 0, 'release_date': '2021-01-01'}
+                   for number in (2, 3)]
+        response = self.client.post(f'/api/webshow/{self.show.pk}/seasons/bulk/', seasons,
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.seasons_count, 3)
 
-# Create your tests here.
+        self.assertEqual(self.client.post('/api/webshow/0/seasons/bulk/', seasons,
+                                          format='json').status_code, 404)
+        self.assertEqual(self.client.post('/api/season/0/episodes/bulk/', [self.episode(1)],
+                                          format='json').status_code, 404)
+        self.assertEqual(self.client.post('/api/season/0/episodes/', self.episode(1),
+                                          format='json').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/webshow/{self.show.pk}/seasons/bulk/', {},
+                                          format='json').status_code, 400)